@@ -0,0 +1,157 @@
+import numpy as np
+
+from config import Config
+from pieces import ROTATION_TABLE, PIECE_TYPES
+from score_manager import LINE_CLEAR_SCORES, GRAVITY_DECAY
+import wallkicks
+
+
+def _build_tables():
+    count = len(PIECE_TYPES)
+    # Cell offsets per (type, rotation); O only has one state and keeps it
+    cells = np.zeros((count, 4, 4, 2), dtype=np.int64)
+    num_states = np.zeros(count, dtype=np.int64)
+    spawn_x = np.zeros(count, dtype=np.int64)
+    spawn_y = np.zeros(count, dtype=np.int64)
+    for t, piece_type in enumerate(PIECE_TYPES):
+        geometry = ROTATION_TABLE[piece_type]
+        num_states[t] = len(geometry.cells)
+        spawn_x[t] = geometry.spawn_x
+        spawn_y[t] = geometry.spawn_y
+        for r in range(4):
+            cells[t, r] = geometry.cells[r % len(geometry.cells)]
+
+    # Kick offsets per (type, from, direction), direction 0 = clockwise and
+    # 1 = counter-clockwise, padded to the longest list in WALL_KICKS
+    kick_lists = {}
+    for t in range(count):
+        for r in range(num_states[t]):
+            for direction, to in enumerate(((r + 1) % num_states[t], (r - 1) % num_states[t])):
+                kick_lists[t, r, direction] = wallkicks.get_wall_kicks(PIECE_TYPES[t], r, to)
+    max_kicks = max(len(kicks) for kicks in kick_lists.values())
+    kicks = np.zeros((count, 4, 2, max_kicks, 2), dtype=np.int64)
+    kick_valid = np.zeros((count, 4, 2, max_kicks), dtype=bool)
+    for (t, r, direction), offsets in kick_lists.items():
+        kicks[t, r, direction, :len(offsets)] = offsets
+        kick_valid[t, r, direction, :len(offsets)] = True
+
+    scores = np.zeros(max(LINE_CLEAR_SCORES) + 1, dtype=np.int64)
+    for lines, points in LINE_CLEAR_SCORES.items():
+        scores[lines] = points
+    return cells, num_states, spawn_x, spawn_y, kicks, kick_valid, scores
+
+
+CELLS, NUM_STATES, SPAWN_X, SPAWN_Y, KICKS, KICK_VALID, LINE_SCORES = _build_tables()
+
+
+class BatchBoards:
+    # N independent main-well boards stepped together. Every operation takes
+    # an optional boolean mask selecting which boards it applies to; boards
+    # that have topped out are always left alone.
+    def __init__(self, count):
+        self.count = count
+        self.width = Config.BOARD_WIDTH
+        self.height = Config.BOARD_HEIGHT
+        self.grid = np.zeros((count, self.height, self.width), dtype=np.int8)
+        self.piece_type = np.zeros(count, dtype=np.int64)
+        self.rotation = np.zeros(count, dtype=np.int64)
+        self.x = np.zeros(count, dtype=np.int64)
+        self.y = np.zeros(count, dtype=np.int64)
+        self.alive = np.ones(count, dtype=bool)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.lines_cleared = np.zeros(count, dtype=np.int64)
+        self.level = np.ones(count, dtype=np.int64)
+        self.gravity = np.full(count, 500, dtype=np.int64)
+        self._rows = np.arange(count)
+
+    def _select(self, mask):
+        return self.alive.copy() if mask is None else self.alive & mask
+
+    def spawn(self, piece_types, mask=None):
+        mask = self._select(mask)
+        piece_types = np.asarray(piece_types, dtype=np.int64)
+        self.piece_type = np.where(mask, piece_types, self.piece_type)
+        self.rotation = np.where(mask, 0, self.rotation)
+        self.x = np.where(mask, SPAWN_X[piece_types], self.x)
+        self.y = np.where(mask, SPAWN_Y[piece_types], self.y)
+
+    def fits(self, rotation, x, y):
+        # True where the piece in the given pose is inside the well and clear
+        cells = CELLS[self.piece_type, rotation]
+        cell_x = x[:, None] + cells[:, :, 0]
+        cell_y = y[:, None] + cells[:, :, 1]
+        inside = (cell_x >= 0) & (cell_x < self.width) & (cell_y < self.height)
+        on_board = inside & (cell_y >= 0)
+        occupied = self.grid[self._rows[:, None],
+                             np.clip(cell_y, 0, self.height - 1),
+                             np.clip(cell_x, 0, self.width - 1)] != 0
+        return np.all(inside & ~(on_board & occupied), axis=1)
+
+    def move(self, dx, dy=0, mask=None):
+        mask = self._select(mask) & self.fits(self.rotation, self.x + dx, self.y + dy)
+        self.x = self.x + np.where(mask, dx, 0)
+        self.y = self.y + np.where(mask, dy, 0)
+        return mask
+
+    def rotate(self, reverse=False, mask=None):
+        pending = self._select(mask)
+        direction = 1 if reverse else 0
+        step = -1 if reverse else 1
+        target = (self.rotation + step) % NUM_STATES[self.piece_type]
+        kicks = KICKS[self.piece_type, self.rotation, direction]
+        valid = KICK_VALID[self.piece_type, self.rotation, direction]
+        rotated = np.zeros(self.count, dtype=bool)
+        # Try kicks in SRS order; each board takes the first one that fits
+        for k in range(kicks.shape[1]):
+            trying = pending & valid[:, k]
+            if not trying.any():
+                continue
+            new_x = self.x + kicks[:, k, 0]
+            new_y = self.y + kicks[:, k, 1]
+            success = trying & self.fits(target, new_x, new_y)
+            self.x = np.where(success, new_x, self.x)
+            self.y = np.where(success, new_y, self.y)
+            self.rotation = np.where(success, target, self.rotation)
+            rotated |= success
+            pending &= ~success
+        return rotated
+
+    def hard_drop(self, mask=None):
+        mask = self._select(mask)
+        falling = mask.copy()
+        while falling.any():
+            falling &= self.fits(self.rotation, self.x, self.y + 1)
+            self.y = self.y + falling
+        return self.lock(mask)
+
+    def lock(self, mask=None):
+        mask = self._select(mask)
+        cells = CELLS[self.piece_type, self.rotation]
+        cell_x = self.x[:, None] + cells[:, :, 0]
+        cell_y = self.y[:, None] + cells[:, :, 1]
+        write = mask[:, None] & (cell_y >= 0)  # Prevent writing to negative indexes
+        rows = np.broadcast_to(self._rows[:, None], write.shape)
+        self.grid[rows[write], cell_y[write], cell_x[write]] = 2
+        lines = self.clear_lines(mask)
+        self.alive &= ~(mask & (self.grid[:, 0, :] != 0).any(axis=1))
+        return lines
+
+    def clear_lines(self, mask=None):
+        mask = self._select(mask)
+        full = (self.grid != 0).all(axis=2) & mask[:, None]
+        lines = full.sum(axis=1)
+        if lines.any():
+            # Stable sort puts cleared rows on top and keeps the rest in order
+            order = np.argsort(~full, axis=1, kind='stable')
+            self.grid = self.grid[self._rows[:, None], order]
+            self.grid[np.arange(self.height)[None, :] < lines[:, None]] = 0
+            self.add_lines_cleared(lines)
+        return lines
+
+    def add_lines_cleared(self, lines):
+        previous = self.lines_cleared
+        self.lines_cleared = previous + lines
+        self.level = self.lines_cleared // 10 + 1
+        self.score += LINE_SCORES[np.minimum(lines, len(LINE_SCORES) - 1)]
+        crossed = self.lines_cleared // 10 > previous // 10
+        self.gravity = np.where(crossed, np.floor(self.gravity * GRAVITY_DECAY).astype(np.int64), self.gravity)
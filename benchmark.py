@@ -0,0 +1,680 @@
+import copy
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from board import Board
+from bitboard import BitBoard
+from events import EventBus
+from engine import GameState, Inputs, HELD_ACTIONS, PRESSED_ACTIONS, LEFT, RIGHT, ROTATE_CW, HARD_DROP
+from pieces import IPiece, OPiece, TPiece, SPiece, ZPiece, JPiece, LPiece, PIECE_CLASSES
+from spin_manager import SpinDetector, SPIN, MINI
+from score_manager import ScoreManager, LINE_CLEAR_SCORES, SPIN_BONUS
+from level_manager import LevelManager
+from replay import ReplayWriter, run_replay
+import rotation
+import snapshot
+import wallkicks
+
+PIECES = [IPiece, OPiece, TPiece, SPiece, ZPiece, JPiece, LPiece]
+
+
+def fill_board(board, seed=1):
+    rng = random.Random(seed)
+    # Ragged stack in the bottom half of the well
+    for y in range(board.height // 2, board.height):
+        for x in range(board.width):
+            if rng.random() < 0.6:
+                board.grid[y][x] = 2
+    if isinstance(board, BitBoard):
+        board.changed()
+    return board
+
+
+def collision_cases(count, seed=2):
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        piece = rng.choice(PIECES)()
+        piece.current_state = rng.randrange(len(piece.states))
+        piece.x = rng.randint(-2, 9)
+        piece.y = rng.randint(-2, 21)
+        cases.append((piece, rng.randint(-1, 1), rng.randint(0, 1), rng.random() < 0.5))
+    return cases
+
+
+def bench_collision(board_class, cases, repeat):
+    board = fill_board(board_class(True))
+    can_move = board.can_move
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for piece, dx, dy, shop_phase in cases:
+            can_move(piece, dx, dy, shop_phase)
+    elapsed = time.perf_counter() - start
+    return len(cases) * repeat / elapsed
+
+
+def check_collision_parity(cases):
+    board = fill_board(Board(True))
+    bitboard = fill_board(BitBoard(True))
+    for piece, dx, dy, shop_phase in cases:
+        expected = board.can_move(piece, dx, dy, shop_phase)
+        if bitboard.can_move(piece, dx, dy, shop_phase) != expected:
+            raise AssertionError(f"can_move mismatch for {piece.type} at ({piece.x},{piece.y}) state {piece.current_state}")
+
+
+def bench_drop_distance(board, cases, repeat):
+    # Each case is timed cold (board just changed) and then hot, the way the
+    # ghost piece asks for the same answer every frame until something moves
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for piece in cases:
+            if isinstance(board, BitBoard):
+                board.version += 1
+            board.drop_distance(piece)
+    cold = len(cases) * repeat / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for piece in cases:
+        for _ in range(repeat):
+            board.drop_distance(piece)
+    hot = len(cases) * repeat / (time.perf_counter() - start)
+    return cold, hot
+
+
+def check_drop_parity(cases):
+    board = fill_board(Board(True))
+    bitboard = fill_board(BitBoard(True))
+    for piece in cases:
+        if bitboard.drop_distance(piece) != board.drop_distance(piece):
+            raise AssertionError(f"drop_distance mismatch for {piece.type} at ({piece.x},{piece.y})")
+
+
+def rotation_cases(board, count, seed=8):
+    # Pieces in poses that fit on the board, each with a turn to try
+    rng = random.Random(seed)
+    cases = []
+    while len(cases) < count:
+        piece = rng.choice(PIECES)()
+        piece.current_state = rng.randrange(len(piece.states))
+        piece.x = rng.randint(-2, 9)
+        piece.y = rng.randint(-2, 21)
+        if board.can_move(piece, 0, 0, False):
+            cases.append((piece, rng.choice(rotation.TURNS)))
+    return cases
+
+
+def rotate_in_place(board, piece, turn):
+    # The old GameState.rotate_piece: turn the piece itself, try each kick
+    # with can_move and turn it back. Returns (rotation, dx, dy) or None.
+    initial_state = piece.current_state
+    piece.current_state = (initial_state + turn) % len(piece.states)
+    for x_offset, y_offset in wallkicks.get_wall_kicks(piece.type, initial_state, piece.current_state):
+        if board.can_move(piece, x_offset, y_offset, False):
+            result = (piece.current_state, x_offset, y_offset)
+            piece.current_state = initial_state
+            return result
+    piece.current_state = initial_state
+    return None
+
+
+def bench_rotation(repeat):
+    board = fill_board(BitBoard(False))
+    cases = rotation_cases(board, 5000)
+    for piece, turn in cases:
+        kicked = rotation.resolve(board, piece, turn, False)
+        if (kicked and kicked[:3]) != rotate_in_place(board, piece, turn):
+            raise AssertionError(f"rotation.resolve mismatch for {piece.type} state {piece.current_state} turn {turn}")
+    rates = []
+    for rotate in (rotate_in_place, lambda board, piece, turn: rotation.resolve(board, piece, turn, False)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for piece, turn in cases:
+                rotate(board, piece, turn)
+        rates.append(len(cases) * repeat / (time.perf_counter() - start))
+    return rates
+
+
+# Known spin setups: the bottom rows of the main well ('X' taken), the
+# locking piece's type, rotation, x, y, (turn, kick index) of its last move
+# (None when that was not a rotation), and the spin expected
+_TSD_ROWS = ["XXXX......",
+             "XXX...XXXX",
+             "XXXX.XXXXX"]
+_MINI_ROWS = ["X.........",
+              "...XXXXXXX"]
+SPIN_SETUPS = [
+    (_TSD_ROWS, 'T', 2, 3, 21, (rotation.CW, 0), SPIN),  # T-spin double under an overhang
+    (_TSD_ROWS, 'T', 2, 3, 21, None, None),  # Same slot, last move not a rotation
+    (_TSD_ROWS[1:], 'T', 2, 3, 21, (rotation.CW, 0), None),  # Only the two bottom corners taken
+    (_MINI_ROWS, 'T', 0, 0, 22, (rotation.CW, 0), MINI),  # One front corner open
+    (_MINI_ROWS, 'T', 0, 0, 22, (rotation.CCW, 4), SPIN),  # The TST kick makes it a full spin
+    (_MINI_ROWS, 'T', 0, 0, 22, (rotation.HALF, 4), MINI),  # Kick 4 of a half turn is not the TST kick
+    (["XXX.......",
+      "...XXXXXXX",
+      ".XXXXXXXXX"], 'L', 2, 0, 21, (rotation.CW, 1), SPIN),  # Cannot move left, right or up
+    (["XXX.......",
+      "..........",
+      "..XXXXXXXX"], 'L', 2, 0, 21, (rotation.CW, 1), None),  # Room to slide right
+    (["X.X.......",
+      "X..XXXXXXX",
+      "XX.XXXXXXX"], 'S', 1, 0, 21, (rotation.CW, 0), SPIN),
+    (["XX........",
+      "X..XXXXXXX",
+      "X..XXXXXXX"], 'O', 0, 1, 22, (rotation.CW, 0), None),  # O pieces never spin
+]
+
+
+def load_bottom_rows(board, rows):
+    top = board.height - len(rows)
+    for dy, row in enumerate(rows):
+        for x, cell in enumerate(row):
+            if cell == 'X':
+                board.grid[top + dy][x] = 2
+    board.changed()
+    return board
+
+
+def check_spins():
+    for rows, piece_type, state, x, y, kick, expected in SPIN_SETUPS:
+        board = load_bottom_rows(BitBoard(False), rows)
+        piece = PIECE_CLASSES[piece_type]()
+        piece.current_state, piece.x, piece.y = state, x, y
+        piece.kick_turn, piece.kick_index = kick or (None, None)
+        if not board.can_move(piece, 0, 0, False):
+            raise AssertionError(f"spin setup for {piece_type} overlaps the stack")
+        spin = SpinDetector.detect_spin(board, piece, False)
+        if spin != expected:
+            raise AssertionError(f"{piece_type} at ({x},{y}) state {state}: expected {expected}, got {spin}")
+
+    # The T-spin double played through the engine: turn the T into the slot
+    # and lock it where it is
+    state = GameState(0)
+    load_bottom_rows(state.board, _TSD_ROWS)
+    state.current_piece = TPiece()
+    state.current_piece.current_state, state.current_piece.x, state.current_piece.y = 1, 3, 21
+    state.perform(ROTATE_CW)
+    state.perform(HARD_DROP)
+    if (state.lines_cleared != 2 or state.score != LINE_CLEAR_SCORES[2] + SPIN_BONUS[SPIN][2]
+            or state.wallet.get_currency("tspin_doubles") != 1):
+        raise AssertionError("T-spin double was not scored or credited")
+    return len(SPIN_SETUPS)
+
+
+def play_pieces(state, rng, pieces):
+    # Random rotations, each hard dropped in the column where it lands
+    # lowest (ties broken at random), so games last and clear lines
+    for _ in range(pieces):
+        if not state.running:
+            break
+        for _ in range(rng.randrange(4)):
+            state.perform(ROTATE_CW)
+        probe = state.current_piece.copy()
+        start = probe.x
+        best = None
+        for dx in range(-5, 14 if state.shop_phase else 6):
+            probe.x = start + dx
+            if state.board.can_move(probe, 0, 0, state.shop_phase):
+                landing = (probe.y + state.board.drop_distance(probe), rng.random())
+                if best is None or landing > best[0]:
+                    best = (landing, dx)
+        dx = best[1] if best is not None else 0
+        for _ in range(abs(dx)):
+            state.perform(RIGHT if dx > 0 else LEFT)
+        state.perform(HARD_DROP)
+
+
+def run_fingerprint(state):
+    return (state.state_hash(), state.score, state.lines_cleared, state.level_manager.get_level(),
+            state.running, list(state.shop.purchases), dict(state.wallet.wallet))
+
+
+def check_replays(seeds=(0, 12345, -7, -(1 << 70), 'daily'), ticks=3000):
+    # Record random key presses for each seed, negative and text seeds
+    # included, then play the file back; run_replay checks the end state
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'run.replay')
+        for seed in seeds:
+            state = GameState(seed)
+            state.recorder = ReplayWriter(open(path, 'wb'), state.rng.seed, state.tick_rate)
+            rng = random.Random(str(seed))
+            held = ()
+            for _ in range(ticks):
+                if rng.random() < 0.05:
+                    held = tuple(action for action in HELD_ACTIONS if rng.random() < 0.3)
+                state.tick(Inputs(held, [rng.choice(PRESSED_ACTIONS)] if rng.random() < 0.05 else []))
+            state.recorder.finish(state)
+            with open(path, 'rb') as file:
+                replayed, _ = run_replay(file)
+            if replayed.rng.seed != seed or run_fingerprint(replayed) != run_fingerprint(state):
+                raise AssertionError(f"Replay of seed {seed!r} diverged")
+    return len(seeds)
+
+
+def bench_snapshots(games=20, repeat=200):
+    # A restored snapshot must play on exactly like the game it was taken
+    # from, given the same moves
+    saves = []
+    for seed in range(games):
+        state = GameState(seed)
+        play_pieces(state, random.Random(seed), 60)
+        data = snapshot.save(state)
+        forked = snapshot.restore(data)
+        reused = snapshot.restore(data, into=GameState(seed + 1))
+        play_pieces(state, random.Random(-seed), 60)
+        for restored in (forked, reused):
+            play_pieces(restored, random.Random(-seed), 60)
+            if run_fingerprint(restored) != run_fingerprint(state):
+                raise AssertionError(f"Game {seed} diverged after restoring a snapshot")
+        saves.append((state, data))
+    for seed in (-7, -(1 << 70), 'daily'):  # Seeds that are not plain varints
+        state = GameState(seed)
+        restored = snapshot.restore(snapshot.save(state))
+        play_pieces(state, random.Random(1), 30)
+        play_pieces(restored, random.Random(1), 30)
+        if restored.rng.seed != seed or run_fingerprint(restored) != run_fingerprint(state):
+            raise AssertionError(f"Game with seed {seed!r} diverged after restoring a snapshot")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for state, _ in saves:
+            snapshot.save(state)
+    save_time = (time.perf_counter() - start) / (repeat * games)
+    into = GameState(0)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, data in saves:
+            snapshot.restore(data, into=into)
+    restore_time = (time.perf_counter() - start) / (repeat * games)
+    return save_time, restore_time, sum(len(data) for _, data in saves) / games
+
+
+def bench_clones(games=20, copies=100):
+    # A clone must play on exactly like the game it was taken from without
+    # touching it, with and without the shop open. Then time and memory per
+    # copy against copy.deepcopy, right after copying and after one piece
+    # has been played on each copy (which unshares the rows it writes).
+    states = []
+    for seed in range(games):
+        state = GameState(seed)
+        play_pieces(state, random.Random(seed), 30)
+        if seed % 2:
+            state.level_manager.level = 6
+            state.update_shop_phase()
+        before = run_fingerprint(state)
+        clone = state.clone()
+        play_pieces(clone, random.Random(-seed), 60)
+        if run_fingerprint(state) != before:
+            raise AssertionError(f"Game {seed} changed when its clone was played")
+        play_pieces(state, random.Random(-seed), 60)
+        if run_fingerprint(clone) != run_fingerprint(state) or clone.board.grid != state.board.grid:
+            raise AssertionError(f"Game {seed} diverged from its clone")
+        state = GameState(seed)
+        play_pieces(state, random.Random(seed), 30)
+        states.append(state)
+
+    results = {}
+    for name, clone in (('deepcopy', copy.deepcopy), ('clone', GameState.clone)):
+        start = time.perf_counter()
+        for state in states:
+            for _ in range(copies):
+                clone(state)
+        elapsed = (time.perf_counter() - start) / (games * copies)
+        sizes = []
+        for played in (0, 1):
+            tracemalloc.start()
+            kept = []
+            for state in states:
+                for _ in range(copies):
+                    kept.append(clone(state))
+                    play_pieces(kept[-1], random.Random(0), played)
+            sizes.append(tracemalloc.get_traced_memory()[0] / len(kept))
+            tracemalloc.stop()
+            del kept
+        results[name] = (elapsed, *sizes)
+    return results
+
+
+def clear_cases(count, seed=6):
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        rows = []
+        full = set(rng.sample(range(12, 24), rng.randint(1, 4)))
+        for y in range(24):
+            if y in full:
+                rows.append([2] * 24)
+            elif y >= 8:
+                rows.append([2 if rng.random() < 0.7 else 0 for _ in range(24)])
+            else:
+                rows.append([0] * 24)
+            if y not in full:
+                rows[-1][rng.randrange(10)] = 0  # Keep partial rows from clearing
+        cases.append(rows)
+    return cases
+
+
+def load_rows(board, rows):
+    for y, row in enumerate(rows):
+        for x, cell in enumerate(row):
+            board.grid[y][x] = cell
+    if isinstance(board, BitBoard):
+        board.changed()
+    return board
+
+
+def bench_clear_lines(board_class, cases):
+    events = EventBus()
+    score_manager = ScoreManager(LevelManager(), events=events)
+    if board_class is BitBoard:
+        # BitBoard publishes cleared lines instead of taking a score manager
+        boards = [load_rows(BitBoard(False, events), rows) for rows in cases]
+        clears = [board.clear_lines for board in boards]
+    else:
+        boards = [load_rows(board_class(False), rows) for rows in cases]
+        clears = [lambda board=board: board.clear_lines(score_manager) for board in boards]
+    start = time.perf_counter()
+    results = [clear() for clear in clears]
+    elapsed = time.perf_counter() - start
+    if board_class is BitBoard:
+        # The surface is updated in place on a clear; it must match a rebuild
+        for board in boards:
+            surface = list(board.surface)
+            board.changed()
+            if board.surface != surface:
+                raise AssertionError("BitBoard.clear_lines left the column surface out of date")
+    return len(cases) / elapsed, results, [[list(row) for row in board.grid] for board in boards]
+
+
+class ScalarRun:
+    # One board driven the same way GameState drives it, as the reference
+    # for the vectorized BatchBoards
+    def __init__(self):
+        events = EventBus()
+        self.board = BitBoard(False, events)
+        self.score_manager = ScoreManager(LevelManager(events), events=events)
+        self.piece = None
+        self.alive = True
+
+    def spawn(self, piece_index):
+        self.piece = PIECES[piece_index]()
+
+    def move(self, dx, dy):
+        if self.board.can_move(self.piece, dx, dy, False):
+            self.piece.x += dx
+            self.piece.y += dy
+
+    def rotate(self, reverse):
+        piece = self.piece
+        kicked = rotation.resolve(self.board, piece, rotation.CCW if reverse else rotation.CW, False)
+        if kicked is not None:
+            piece.current_state, x_offset, y_offset, _ = kicked
+            piece.x += x_offset
+            piece.y += y_offset
+
+    def hard_drop(self):
+        self.piece.y += self.board.drop_distance(self.piece)
+        self.board.add_piece(self.piece)
+        self.board.clear_lines()
+        if any(self.board.grid[0][x] != 0 for x in range(self.board.width)):
+            self.alive = False
+
+
+def batch_turns(count, turns, seed=3):
+    rng = random.Random(seed)
+    # Each turn every board rotates, shifts, soft drops part of the way,
+    # rotates again (kicking off the stack or walls) and hard drops
+    actions = []
+    for _ in range(turns):
+        for k in range(3):
+            actions.append(('cw', [rng.random() < 0.4 for _ in range(count)]))
+        shifts = [rng.randint(-5, 5) for _ in range(count)]
+        for k in range(5):
+            actions.append(('left', [shift < -k for shift in shifts]))
+            actions.append(('right', [shift > k for shift in shifts]))
+        depth = [rng.randint(0, 20) for _ in range(count)]
+        for k in range(20):
+            actions.append(('down', [d > k for d in depth]))
+        actions.append((rng.choice(['cw', 'ccw']), [rng.random() < 0.5 for _ in range(count)]))
+        actions.append(('drop', [rng.randrange(len(PIECES)) for _ in range(count)]))
+    return actions
+
+
+def run_batch(batch, first_pieces, actions):
+    import numpy as np
+    batch.spawn(np.array(first_pieces))
+    for action, argument in actions:
+        if action == 'drop':
+            batch.hard_drop()
+            batch.spawn(np.array(argument))
+            continue
+        mask = np.array(argument)
+        if action == 'left':
+            batch.move(-1, mask=mask)
+        elif action == 'right':
+            batch.move(1, mask=mask)
+        elif action == 'down':
+            batch.move(0, 1, mask=mask)
+        else:
+            batch.rotate(reverse=action == 'ccw', mask=mask)
+
+
+def run_scalar(runs, first_pieces, actions):
+    for i, run in enumerate(runs):
+        run.spawn(first_pieces[i])
+    for action, argument in actions:
+        for i, run in enumerate(runs):
+            if not run.alive:
+                continue
+            if action == 'drop':
+                run.hard_drop()
+                if run.alive:
+                    run.spawn(argument[i])
+            elif not argument[i]:
+                continue
+            elif action == 'left':
+                run.move(-1, 0)
+            elif action == 'right':
+                run.move(1, 0)
+            elif action == 'down':
+                run.move(0, 1)
+            else:
+                run.rotate(action == 'ccw')
+
+
+def add_garbage(batch, runs, rows, seed=5):
+    # Nearly full rows with one gap each, so random play clears lines
+    rng = random.Random(seed)
+    for i, run in enumerate(runs):
+        for y in range(batch.height - rows, batch.height):
+            gap = rng.randrange(batch.width)
+            for x in range(batch.width):
+                if x != gap:
+                    run.board.grid[y][x] = 2
+                    batch.grid[i, y, x] = 2
+        run.board.changed()
+
+
+def check_batch_parity(count=256, turns=60):
+    from batch import BatchBoards
+    first_pieces = [i % len(PIECES) for i in range(count)]
+    actions = batch_turns(count, turns)
+    batch = BatchBoards(count)
+    runs = [ScalarRun() for _ in range(count)]
+    add_garbage(batch, runs, 8)
+    run_batch(batch, first_pieces, actions)
+    run_scalar(runs, first_pieces, actions)
+    for i, run in enumerate(runs):
+        grid = [row[:run.board.width] for row in run.board.grid]
+        if (batch.grid[i].tolist() != grid or batch.score[i] != run.score_manager.get_score()
+                or batch.lines_cleared[i] != run.score_manager.get_lines_cleared()
+                or batch.alive[i] != run.alive):
+            raise AssertionError(f"BatchBoards diverged from the scalar board on board {i}")
+    return int(batch.lines_cleared.sum())
+
+
+def bench_batch(count, turns):
+    from batch import BatchBoards
+    first_pieces = [i % len(PIECES) for i in range(count)]
+    actions = batch_turns(count, turns, seed=4)
+    batch = BatchBoards(count)
+    start = time.perf_counter()
+    run_batch(batch, first_pieces, actions)
+    batch_rate = count * turns / (time.perf_counter() - start)
+    runs = [ScalarRun() for _ in range(count)]
+    start = time.perf_counter()
+    run_scalar(runs, first_pieces, actions)
+    scalar_rate = count * turns / (time.perf_counter() - start)
+    return scalar_rate, batch_rate
+
+
+def placement_states(games=4, pieces=200, every=5, seed=7):
+    # Positions from real games, shop phase included: the bot plays each
+    # game and every few pieces the state is kept
+    from bot import Bot
+    bot = Bot(depth=1)
+    states = []
+    for game in range(games):
+        state = GameState(seed + game)
+        for count in range(pieces):
+            if not state.running:
+                break
+            if count % every == 0:
+                states.append(state.clone())
+            for action in bot.policy(state, None):
+                state.perform(action)
+    return states
+
+
+def reachable_locks(board, piece, shop_phase):
+    # Reference for find_placements: plain BFS one cell at a time through
+    # can_move, returning the cells of every pose that cannot fall further
+    start = (piece.x, piece.y, piece.current_state)
+    seen = {start}
+    queue = [start]
+    locks = set()
+    for x, y, r in queue:
+        probe = piece.copy()
+        probe.x, probe.y, probe.current_state = x, y, r
+        nodes = [(x + dx, y + dy, r) for dx, dy in ((-1, 0), (1, 0), (0, 1))
+                 if board.can_move(probe, dx, dy, shop_phase)]
+        if not board.can_move(probe, 0, 1, shop_phase):
+            locks.add(frozenset((x + cx, y + cy) for cx, cy in probe.cells))
+        for step in (1, -1, 2):
+            probe.current_state = (r + step) % len(probe.states)
+            for x_offset, y_offset in wallkicks.get_wall_kicks(probe.type, r, probe.current_state):
+                if board.can_move(probe, x_offset, y_offset, shop_phase):
+                    nodes.append((x + x_offset, y + y_offset, probe.current_state))
+                    break
+        for node in nodes:
+            if node not in seen:
+                seen.add(node)
+                queue.append(node)
+    return locks
+
+
+def placement_cells(piece, placement):
+    return frozenset((placement.x + cx, placement.y + cy) for cx, cy in piece.geometry.cells[placement.rotation])
+
+
+def bench_placements(states):
+    # find_placements for every piece type against the reference BFS, and
+    # find_path for the placement the bot picks, played out on a copy of
+    # the game. Times are per call, split into main and shop phase.
+    from bot import Bot
+    from placements import find_placements, find_path
+    bot = Bot(depth=1)
+    times = {False: [0, 0, 0], True: [0, 0, 0]}  # Placements time, path time, count
+    for state in states:
+        board = state.board
+        shop_phase = state.shop_phase
+        for piece_class in PIECES:
+            piece = piece_class()
+            placements = find_placements(board, piece, shop_phase)
+            cells = {placement_cells(piece, placement) for placement in placements}
+            if len(cells) != len(placements) or cells != reachable_locks(board, piece, shop_phase):
+                raise AssertionError(f"placement search mismatch for {piece.type}")
+
+        piece = state.current_piece
+        chosen = bot.choose(state)
+        if chosen is None:
+            continue
+        start = time.perf_counter()
+        find_placements(board, piece, shop_phase)
+        middle = time.perf_counter()
+        path = find_path(board, piece, shop_phase, chosen)
+        end = time.perf_counter()
+        total = times[shop_phase]
+        total[0] += middle - start
+        total[1] += end - middle
+        total[2] += 1
+
+        game = state.clone()
+        for action in path[:-1]:
+            game.perform(action)
+        landed = game.current_piece.copy()
+        landed.y += game.board.drop_distance(landed)
+        if frozenset((landed.x + x, landed.y + y) for x, y in landed.cells) != placement_cells(piece, chosen):
+            raise AssertionError(f"path for {piece.type} does not reach its placement")
+    return {phase: (placements / count, paths / count, count)
+            for phase, (placements, paths, count) in times.items() if count}
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    cases = collision_cases(5000)
+    check_collision_parity(cases)
+    before = bench_collision(Board, cases, repeat)
+    after = bench_collision(BitBoard, cases, repeat)
+    print(f"can_move  Board:    {before:12,.0f} checks/sec")
+    print(f"can_move  BitBoard: {after:12,.0f} checks/sec ({after / before:.1f}x)")
+
+    board = fill_board(Board(True))
+    drops = [piece for piece, _, _, _ in cases if board.can_move(piece, 0, 0, True)]
+    check_drop_parity(drops)
+    before, _ = bench_drop_distance(board, drops, repeat)
+    cold, hot = bench_drop_distance(fill_board(BitBoard(True)), drops, repeat)
+    print(f"drop      Board:    {before:12,.0f} lookups/sec")
+    print(f"drop      BitBoard: {cold:12,.0f} lookups/sec cold ({cold / before:.1f}x), {hot:,.0f} cached ({hot / before:.1f}x)")
+
+    before, after = bench_rotation(repeat)
+    print(f"rotate    in place: {before:12,.0f} attempts/sec")
+    print(f"rotate    table:    {after:12,.0f} attempts/sec ({after / before:.1f}x)")
+
+    print(f"spins ok ({check_spins()} setups)")
+
+    print(f"replays ok ({check_replays()} seeds)")
+
+    save_time, restore_time, size = bench_snapshots()
+    print(f"snapshot  parity ok, {size:,.0f} bytes, save {save_time * 1e6:.0f} us, restore {restore_time * 1e6:.0f} us")
+
+    clones = bench_clones()
+    print("clone     parity ok")
+    for name, (elapsed, size, played) in clones.items():
+        print(f"clone     {name + ':':9} {elapsed * 1e6:9.0f} us, {size / 1024:5.1f} KB/copy, "
+              f"{played / 1024:5.1f} KB after a piece")
+
+    cases = clear_cases(2000)
+    before, expected, expected_grids = bench_clear_lines(Board, cases)
+    after, results, grids = bench_clear_lines(BitBoard, cases)
+    if results != expected or grids != expected_grids:
+        raise AssertionError("BitBoard.clear_lines diverged from Board.clear_lines")
+    print(f"clear     Board:    {before:12,.0f} clears/sec")
+    print(f"clear     BitBoard: {after:12,.0f} clears/sec ({after / before:.1f}x)")
+
+    lines = check_batch_parity()
+    scalar_rate, batch_rate = bench_batch(2048, 20)
+    print(f"batch parity ok ({lines} lines cleared across boards)")
+    print(f"turns     scalar:   {scalar_rate:12,.0f} placements/sec")
+    print(f"turns     batch:    {batch_rate:12,.0f} placements/sec ({batch_rate / scalar_rate:.1f}x)")
+
+    results = bench_placements(placement_states())
+    print("placements parity ok")
+    for shop_phase, (placements, paths, count) in results.items():
+        print(f"placements {'shop' if shop_phase else 'main'}:   {placements * 1e6:9.0f} us/piece, "
+              f"path {paths * 1e6:.0f} us ({count} positions from games)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+from config import Config
+from board import Board
+from events import EventBus, PieceLocked, LinesCleared
+import zobrist
+
+# Column x of the grid lives at bit x + PAD so pieces hanging off the left
+# edge still produce a non-negative shift; the PAD bits act as the left wall.
+PAD = 4
+MAX_PIECE_WIDTH = 4
+_LOCKED_CELLS = [bytes(2 if byte >> x & 1 else 0 for x in range(8)) for byte in range(256)]  # 8 cells by their row bits
+_BORDER_DIGITS = bytes.maketrans(b'\x00\x01\x02', b'010')  # Cell values to '1' for a border, '0' otherwise
+
+
+class _Row(list):
+    # A grid row that keeps an occupancy bitmask and its board's Zobrist hash
+    # in sync with its cells, so code that writes board.grid[y][x] directly
+    # (setup code, the benchmarks) keeps working on a board that has never
+    # been copied. board is the board that owns the row, or None once
+    # copy() has shared it between boards; a shared row cannot tell which
+    # board a write is meant for, so it refuses writes and the writer must
+    # go through BitBoard.writable(y).
+    __slots__ = ('mask', 'board', 'keys')
+
+    def __init__(self, cells, board, y):
+        super().__init__(cells)
+        self.board = board
+        self.keys = zobrist.KEYS[y]
+        self.mask = 0
+        for x, cell in enumerate(cells):
+            if cell:
+                self.mask |= 1 << (x + PAD)
+
+    def __setitem__(self, x, value):
+        if self.board is None:
+            raise TypeError("Grid row is shared with a copy of the board; write through board.writable(y)[x]")
+        list.__setitem__(self, x, value)
+        bit = 1 << (x + PAD)
+        if bool(value) != bool(self.mask & bit):
+            self.mask ^= bit
+            self.board.hash ^= self.keys[x + PAD]
+
+    def write_bits(self, bits, value):
+        # Set every cell under a row bitmask to value at once
+        changed = bits & ~self.mask if value else bits & self.mask
+        keys = self.keys
+        row_hash = 0
+        while bits:
+            low = bits & -bits
+            bit = low.bit_length() - 1
+            list.__setitem__(self, bit - PAD, value)
+            if low & changed:
+                row_hash ^= keys[bit]
+            bits ^= low
+        self.mask ^= changed
+        self.board.hash ^= row_hash
+
+    def copy_for(self, board):
+        row = _Row.__new__(_Row)
+        list.extend(row, self)
+        row.mask = self.mask
+        row.keys = self.keys
+        row.board = board
+        return row
+
+
+class BitBoard(Board):
+    # Unlike Board, locks and line clears are published on the event bus
+    # (PieceLocked, LinesCleared) rather than pushed to a score manager
+    def __init__(self, shop_phase, events=None):
+        super().__init__(shop_phase)
+        self.events = events if events is not None else EventBus()
+        self.grid = [_Row(row, self, y) for y, row in enumerate(self.grid)]
+        # Zobrist hash of which cells are occupied, kept up to date on every
+        # write. With Config.DEBUG_HASH it is checked against a full rehash
+        # after each change.
+        self.hash = zobrist.hash_rows([row.mask for row in self.grid])
+        total_width = self.width + self.shop_width
+        left_wall = (1 << PAD) - 1
+        # Everything right of the playable area is solid, with enough spare
+        # bits that a piece can never slip past the wall.
+        beyond = (1 << (PAD + total_width + MAX_PIECE_WIDTH)) - 1
+        self.walls = {
+            False: left_wall | (beyond & ~((1 << (PAD + self.width)) - 1)),
+            True: left_wall | (beyond & ~((1 << (PAD + total_width - 1)) - 1)),
+        }
+        self.full_row = ((1 << self.width) - 1) << PAD
+        self.touched_rows = None  # Rows written by the last add_piece
+        self.written = []  # (row, row bits) of the cells the last add_piece wrote
+
+        # Bumped on every change to the grid; anything derived from the cells
+        # is cached against it. Code that writes grid cells directly must
+        # call changed() afterwards.
+        self.version = 0
+        self.surface = [self.height] * total_width  # Topmost occupied row per column
+        self._drop_key = None
+        self._drop_distance = 0
+        self.changed()
+
+    def copy(self, events=None):
+        # A board with the same cells that shares its rows with this one
+        # until either side writes to them (copy-on-write): both boards mark
+        # every row as shared, and the first write to a shared row gives the
+        # writer a private copy. The walls, keys and row objects are shared;
+        # only the row list and the surface are copied up front.
+        for row in self.grid:
+            row.board = None
+        board = BitBoard.__new__(BitBoard)
+        board.__dict__.update(self.__dict__)
+        board.events = events if events is not None else EventBus()
+        board.grid = list(self.grid)
+        board.surface = list(self.surface)
+        return board
+
+    def writable(self, y):
+        # Row y, first copied if it is shared with another board. Anything
+        # that writes to a row of a board that may have been copied must get
+        # the row from here.
+        row = self.grid[y]
+        if row.board is not self:
+            row = self.grid[y] = row.copy_for(self)
+        return row
+
+    def changed(self):
+        self.version += 1
+        self._update_surface()
+        if Config.DEBUG_HASH:
+            self.check_hash()
+
+    def check_hash(self):
+        expected = zobrist.hash_rows([row.mask for row in self.grid])
+        if self.hash != expected:
+            raise AssertionError(f"Board hash {self.hash:016x} drifted from full rehash {expected:016x}")
+
+    def _update_surface(self):
+        surface = self.surface
+        for x in range(len(surface)):
+            surface[x] = self.height
+        seen = 0
+        for y, row in enumerate(self.grid):
+            new = row.mask & ~seen
+            while new:
+                low = new & -new
+                surface[low.bit_length() - 1 - PAD] = y
+                new ^= low
+            seen |= row.mask
+
+    def can_move(self, piece, dx, dy, shop_phase):
+        return self.fits(piece.geometry.row_masks[piece.current_state], piece.x + dx, piece.y + dy, shop_phase)
+
+    def fits(self, row_masks, x, top, shop_phase):
+        # Whether a shape given as (row offset, bitmask) pairs is clear of
+        # the stack and walls with its top-left corner at (x, top)
+        shift = x + PAD
+        if shift < 0:
+            return False
+        walls = self.walls[shop_phase]
+        grid = self.grid
+        for y, mask in row_masks:
+            new_y = top + y
+            if new_y >= self.height:
+                return False
+            mask <<= shift
+            if new_y >= 0:
+                if (grid[new_y].mask | walls) & mask:
+                    return False
+            elif walls & mask:
+                return False
+        return True
+
+    def add_piece(self, piece):
+        touched_rows = []
+        for x, y in piece.cells:
+            if piece.y + y >= 0:  # Prevent writing to negative indexes
+                self.writable(piece.y + y)[piece.x + x] = 2
+                touched_rows.append(piece.y + y)
+                if piece.y + y < self.surface[piece.x + x]:
+                    self.surface[piece.x + x] = piece.y + y
+        self.touched_rows = touched_rows
+        shift = piece.x + PAD
+        self.written = [(piece.y + y, mask << shift) for y, mask in piece.row_masks if piece.y + y >= 0]
+        self.version += 1
+        if Config.DEBUG_HASH:
+            self.check_hash()
+        self.events.emit(PieceLocked, self, piece, self.written)
+
+    def clear_lines(self, rows=None):
+        # Only rows the last piece wrote to can have become full; fall back
+        # to the whole board when nothing has been placed since the last call
+        if rows is None:
+            rows = self.touched_rows if self.touched_rows is not None else range(self.height)
+        self.touched_rows = None
+        grid = self.grid
+        full_row = self.full_row
+        cleared = sorted({y for y in rows if grid[y].mask & full_row == full_row})
+        if not cleared:
+            return cleared
+
+        # Compact the surviving rows above the lowest cleared row in a single
+        # sweep, moving only the main board columns; the shop area stays put.
+        # Rows above the top of the main stack are empty there, so the sweep
+        # stops at it and only has to blank what was copied down.
+        width = self.width
+        surface = self.surface
+        top = min(surface[:width])
+        skip = set(cleared)
+        write_y = cleared[-1]
+        for y in range(write_y - 1, top - 1, -1):
+            if y in skip:
+                continue
+            if write_y != y:
+                self._copy_main_columns(write_y, grid[y])
+            write_y -= 1
+        empty = [0] * width
+        for y in range(write_y, top - 1, -1):
+            if grid[y].mask & full_row:
+                row = self.writable(y)
+                list.__setitem__(row, slice(0, width), empty)
+                self.hash ^= zobrist.hash_bits(y, row.mask & full_row)
+                row.mask &= ~full_row
+
+        # Every main column is filled in the cleared rows, so its top cell
+        # just moves down by the number cleared, unless that cell was in
+        # the top cleared row itself; only those columns are looked up again
+        count = len(cleared)
+        exposed = 0
+        for x in range(width):
+            if surface[x] < cleared[0]:
+                surface[x] += count
+            else:
+                surface[x] = self.height
+                exposed |= 1 << (x + PAD)
+        for y in range(write_y + 1, self.height):
+            if not exposed:
+                break
+            found = grid[y].mask & exposed
+            while found:
+                low = found & -found
+                surface[low.bit_length() - 1 - PAD] = y
+                found ^= low
+            exposed &= ~grid[y].mask
+        self.version += 1
+        if Config.DEBUG_HASH:
+            self.check_hash()
+        all_clear = not any(row.mask & full_row for row in grid[write_y + 1:])
+        self.events.emit(LinesCleared, cleared, len(cleared), all_clear)
+        return cleared
+
+    def drop_distance(self, piece):
+        # How far the piece can fall, cached until it moves, rotates or the
+        # board changes. Reads column surfaces when every column of the piece
+        # sits above the stack; a piece tucked under an overhang falls back
+        # to stepping down row by row.
+        key = (piece.type, piece.current_state, piece.x, piece.y, self.version)
+        if key == self._drop_key:
+            return self._drop_distance
+        surface = self.surface
+        distance = self.height
+        for x, y in piece.geometry.column_bottoms[piece.current_state]:
+            below = surface[piece.x + x] - (piece.y + y) - 1
+            if below < 0:
+                distance = Board.drop_distance(self, piece)
+                break
+            if below < distance:
+                distance = below
+        self._drop_key = key
+        self._drop_distance = distance
+        return distance
+
+    def write_masks(self, rows, value):
+        # Set the cells of (grid row, row bits) pairs to value; call
+        # changed() afterwards
+        for y, bits in rows:
+            self.writable(y).write_bits(bits, value)
+
+    def border_masks(self):
+        # Per row, the bits of cells that are borders (1) rather than
+        # locked pieces (2). Each row is read as a binary string, last cell
+        # first, so the work stays in C.
+        masks = []
+        for row in self.grid:
+            masks.append(int(bytes(row).translate(_BORDER_DIGITS)[::-1], 2) << PAD if row.mask else 0)
+        return masks
+
+    def load_masks(self, masks, borders, row_hash=None):
+        # Replace every row from its occupancy bits and border bits (see
+        # border_masks); occupied cells that are not borders are locked.
+        # row_hash is the board's Zobrist hash if the caller saved it, which
+        # saves rehashing every row.
+        width = len(self.grid[0])
+        shifts = range(PAD, PAD + width, 8)
+        for y, (mask, border) in enumerate(zip(masks, borders)):
+            row = self.writable(y)
+            if mask:
+                # Every occupied cell as locked, eight at a time, then the
+                # few border cells
+                cells = list(b''.join([_LOCKED_CELLS[mask >> shift & 255] for shift in shifts])[:width])
+                while border:
+                    low = border & -border
+                    cells[low.bit_length() - 1 - PAD] = 1
+                    border ^= low
+            else:
+                cells = [0] * width
+            list.__setitem__(row, slice(None), cells)
+            row.mask = mask
+        self.hash = zobrist.hash_rows(masks) if row_hash is None else row_hash
+        self.touched_rows = None
+        self.written = []
+        self.changed()
+
+    def clear_shop_area(self):
+        area = ((1 << self.shop_width - 2) - 1) << (PAD + self.width + 2)
+        self.write_masks([(y, area) for y, row in enumerate(self.grid) if row.mask & area], 0)
+        self.changed()
+
+    def _copy_main_columns(self, y, source):
+        target = self.writable(y)
+        list.__setitem__(target, slice(0, self.width), source[:self.width])
+        mask = (target.mask & ~self.full_row) | (source.mask & self.full_row)
+        if mask != target.mask:
+            self.hash ^= zobrist.hash_bits(y, mask ^ target.mask)
+            target.mask = mask
@@ -1,17 +1,13 @@
-import pygame
 from config import Config
-from spin_manager import SpinDetector
 
 class Board:
-    def __init__(self, screen, shop_phase):
+    def __init__(self, shop_phase):
         self.width = Config.BOARD_WIDTH
         self.height = Config.BOARD_HEIGHT
         self.shop_width = Config.SHOP_WIDTH
         self.cell_size = Config.CELL_SIZE
         self.grid_color = Config.GRID_COLOR
-        self.screen = screen
         self.grid = [[0 for _ in range(self.width + self.shop_width)] for _ in range(self.height)]
-        self.spinDetector = SpinDetector
 
         # Mark border cells as occupied
         if(shop_phase):
@@ -42,14 +38,13 @@ class Board:
                 if cell:
                     if piece.y + y >= 0:  # Prevent writing to negative indexes
                         self.grid[piece.y + y][piece.x + x] = 2
-        self.spinDetector.detect_spin(piece)
 
     def clear_lines(self, score_manager):
-        lines_cleared = 0
+        cleared = []
 
         for y in range(self.height):
             if all(self.grid[y][x] != 0 for x in range(self.width)):  # Check only up to the main board width
-                lines_cleared += 1
+                cleared.append(y)
                 # Move all rows above down by one
                 for move_down_y in range(y, 0, -1):
                     for x in range(self.width):
@@ -59,10 +54,10 @@ class Board:
                     self.grid[0][x] = 0
 
         # Add the cleared lines to the score manager
-        if lines_cleared > 0:
-            score_manager.add_lines_cleared(lines_cleared)
+        if cleared:
+            score_manager.add_lines_cleared(len(cleared))
         
-        return lines_cleared
+        return cleared
 
     def can_move(self, piece, dx, dy, shop_phase):
         for y, row in enumerate(piece.shape):
@@ -90,28 +85,14 @@ class Board:
 
         return True
 
-    def draw_borders(self, offset_x, offset_y, shop_phase):
-        for y in range(self.height):
-            if(shop_phase):
-                for x in range(self.width+self.shop_width):
-                    if self.grid[y][x] == 2:
-                        pygame.draw.rect(self.screen, (200, 55, 169),
-                                        (offset_x + x * self.cell_size,
-                                        offset_y + (y-2) * self.cell_size,
-                                        self.cell_size, self.cell_size))
-                    if (self.grid[y][x] == 1 and x < self.width):
-                        pygame.draw.rect(self.screen, (0, 0, 0),
-                                        (offset_x + x * self.cell_size,
-                                        offset_y + (y-2) * self.cell_size,
-                                        self.cell_size, self.cell_size))  
-            else:
-                for x in range(self.width):
-                    if self.grid[y][x] == 2:
-                        pygame.draw.rect(self.screen, (200, 55, 169),
-                                        (offset_x + x * self.cell_size,
-                                        offset_y + (y-2) * self.cell_size,
-                                        self.cell_size, self.cell_size))
-                        
+    def drop_distance(self, piece):
+        # Walls only limit sideways movement, so check against the wider
+        # shop-phase bounds; a piece in the shop area can still fall
+        distance = 0
+        while self.can_move(piece, 0, distance + 1, True):
+            distance += 1
+        return distance
+
     def clear_shop_area(self):
         for y in range(self.height):
             for x in range(self.width+2, self.width + self.shop_width):
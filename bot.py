@@ -0,0 +1,236 @@
+import sys
+import time
+from collections import OrderedDict
+
+from config import Config
+from bitboard import PAD
+from engine import HARD_DROP
+from pieces import PIECE_CLASSES, PIECE_TYPES
+from placements import fit_table, lock_positions, search_path
+from shop import SLOT_TABLE
+import zobrist
+
+FULL_ROW = ((1 << Config.BOARD_WIDTH) - 1) << PAD
+SHOP_AREA = ((1 << Config.SHOP_WIDTH) - 1) << (PAD + Config.BOARD_WIDTH)
+LOST = float('-inf')
+
+WEIGHTS = {
+    'height': -0.51,  # Sum of main column heights
+    'holes': -0.36,  # Empty cells with a filled cell somewhere above
+    'bumpiness': -0.18,  # Height differences between neighbouring columns
+    'wells': -0.1,  # Depth of columns lower than both neighbours
+    'lines': 0.76,  # Per line cleared by a placement
+    'shop_cells': 0.6,  # Per filled cell of an open shop slot
+    'shop_filled': 4.0,  # Per open shop slot completely filled
+    'shop_stray': -0.3,  # Per occupied cell in the shop area
+}
+
+
+class TranspositionTable:
+    # Board scores keyed by Zobrist hash; least recently used entries are
+    # dropped once the table is full
+    def __init__(self, max_entries=1 << 16):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def lock(rows, row_hash, piece_type, placement):
+    # Places a piece on a copy of rows and clears full lines the way
+    # BitBoard does. Returns (rows, hash, lines, topped out).
+    rows = list(rows)
+    shift = placement.x + PAD
+    touched = []
+    topped = False
+    for dy, mask in PIECE_CLASSES[piece_type].geometry.row_masks[placement.rotation]:
+        y = placement.y + dy
+        if y < 0:
+            topped = True
+            continue
+        bits = mask << shift
+        rows[y] |= bits
+        row_hash ^= zobrist.hash_bits(y, bits)
+        touched.append(y)
+    cleared = {y for y in touched if rows[y] & FULL_ROW == FULL_ROW}
+    if cleared:
+        # Main columns of the surviving rows drop down; the shop area stays
+        main = [0] * len(cleared) + [row & FULL_ROW for y, row in enumerate(rows) if y not in cleared]
+        rows = [(row & ~FULL_ROW) | bits for row, bits in zip(rows, main)]
+        row_hash = zobrist.hash_rows(rows)
+    return rows, row_hash, len(cleared), topped or bool(rows[0] & FULL_ROW)
+
+
+def features(rows):
+    height = len(rows)
+    column_heights = [0] * Config.BOARD_WIDTH
+    holes = 0
+    seen = 0
+    stray = 0
+    for y, row in enumerate(rows):
+        stray += (row & SHOP_AREA).bit_count()
+        main = row & FULL_ROW
+        holes += (seen & ~main).bit_count()
+        new = main & ~seen
+        while new:
+            low = new & -new
+            column_heights[low.bit_length() - 1 - PAD] = height - y
+            new ^= low
+        seen |= main
+    bumpiness = 0
+    wells = 0
+    last = Config.BOARD_WIDTH - 1
+    for x, h in enumerate(column_heights):
+        if x < last:
+            bumpiness += abs(h - column_heights[x + 1])
+        left = column_heights[x - 1] if x > 0 else height
+        right = column_heights[x + 1] if x < last else height
+        depth = min(left, right) - h
+        if depth > 0:
+            wells += depth
+    return sum(column_heights), holes, bumpiness, wells, stray
+
+
+def open_slots(state):
+    # Row masks of the cells still to fill for each slot on sale
+    slots = []
+    if not state.shop_phase:
+        return slots
+    shop = state.shop
+    for index in range(len(shop.shop_items)):
+        if shop.shop_items[index] == 0:
+            continue
+        slot = SLOT_TABLE[shop.shop_slots[index]]
+        slots.append((tuple(shop.slot_masks(index, slot.cell_masks)), slot.size))
+    return slots
+
+
+class Bot:
+    # Picks a placement for the current piece by beam search: every placement
+    # of a piece is scored with the heuristic, the best beam_width are
+    # expanded with the next piece, and so on for depth pieces. Known preview
+    # pieces are used as they are; past the preview each of the seven pieces
+    # is tried and the results averaged.
+    def __init__(self, weights=WEIGHTS, beam_width=6, depth=2, table_size=1 << 16):
+        self.weights = weights
+        self.beam_width = beam_width
+        self.depth = depth
+        self.table = TranspositionTable(table_size)
+        self.evaluated = 0  # Placements scored, from the table or not
+
+    def board_value(self, rows, row_hash):
+        value = self.table.get(row_hash)
+        if value is None:
+            w = self.weights
+            height, holes, bumpiness, wells, stray = features(rows)
+            value = (w['height'] * height + w['holes'] * holes + w['bumpiness'] * bumpiness
+                     + w['wells'] * wells + w['shop_stray'] * stray)
+            self.table.put(row_hash, value)
+        return value
+
+    def shop_value(self, rows, slots):
+        value = 0
+        w = self.weights
+        for cells, size in slots:
+            filled = 0
+            for y, bits in cells:
+                filled += (rows[y] & bits).bit_count()
+            value += w['shop_cells'] * filled
+            if filled == size:
+                value += w['shop_filled']
+        return value
+
+    def expand(self, rows, row_hash, piece, walls, slots, fits=None):
+        # (score, placement, rows, hash, line reward) for every placement,
+        # best first, cut to the beam width
+        children = []
+        for placement in lock_positions(rows, walls, piece, fits):
+            child, child_hash, lines, topped = lock(rows, row_hash, piece.type, placement)
+            self.evaluated += 1
+            if topped:
+                continue
+            reward = self.weights['lines'] * lines
+            score = self.board_value(child, child_hash) + self.shop_value(child, slots) + reward
+            children.append((score, placement, child, child_hash, reward))
+        children.sort(key=lambda child: child[0], reverse=True)
+        return children[:self.beam_width]
+
+    def best(self, rows, row_hash, piece_type, preview, depth, walls, slots):
+        piece = PIECE_CLASSES[piece_type]()
+        children = self.expand(rows, row_hash, piece, walls, slots)
+        if not children:
+            return LOST
+        if depth == 1:
+            return children[0][0]
+        return max(reward + self.expect(child, child_hash, preview, depth - 1, walls, slots)
+                   for _, _, child, child_hash, reward in children)
+
+    def expect(self, rows, row_hash, preview, depth, walls, slots):
+        if preview:
+            return self.best(rows, row_hash, preview[0], preview[1:], depth, walls, slots)
+        return sum(self.best(rows, row_hash, piece_type, (), depth, walls, slots)
+                   for piece_type in PIECE_TYPES) / len(PIECE_TYPES)
+
+    def choose(self, state, preview=()):
+        # Best placement for state.current_piece with its path, or None if
+        # every placement tops out. preview lists the types of the pieces
+        # that come next. Only the placement picked gets a path.
+        rows = [row.mask for row in state.board.grid]
+        row_hash = state.board.hash
+        walls = state.board.walls[state.shop_phase]
+        slots = open_slots(state)
+        piece = state.current_piece
+        fits = fit_table(rows, walls, piece.geometry)
+        children = self.expand(rows, row_hash, piece, walls, slots, fits)
+        if not children:
+            return None
+        best = children[0][1]
+        if self.depth > 1:
+            best_value = LOST
+            for _, placement, child, child_hash, reward in children:
+                value = reward + self.expect(child, child_hash, tuple(preview), self.depth - 1, walls, slots)
+                if value > best_value:
+                    best_value = value
+                    best = placement
+        return best._replace(path=search_path(rows, walls, piece, best, fits))
+
+    def policy(self, state, rng):
+        # Action path for tournament.play_game
+        placement = self.choose(state, state.preview())
+        return placement.path if placement is not None else [HARD_DROP]
+
+
+def main():
+    from tournament import play_game
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    pieces_per_game = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    bot = Bot()
+    pieces = 0
+    start = time.perf_counter()
+    for seed in range(games):
+        state, placed = play_game(seed, policy=bot.policy, max_pieces=pieces_per_game)
+        pieces += placed
+        print(f"game {seed}: {placed} pieces, {state.lines_cleared} lines, score {state.score}, "
+              f"level {state.level_manager.get_level()}, purchases {state.shop.purchases}")
+    elapsed = time.perf_counter() - start
+    lookups = bot.table.hits + bot.table.misses
+    print(f"{bot.evaluated / elapsed:,.0f} placements evaluated/sec, {pieces / elapsed:.1f} pieces/sec, "
+          f"table hit rate {bot.table.hits / max(1, lookups):.0%} ({len(bot.table.entries):,} entries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,3 +9,16 @@ class Config:
     SHOP_COLOR = (150, 150, 150)
     SLOT_COLOR = (255, 0, 0)
     NUM_SHOP_SLOTS = 3  # Number of slots in the shop
+    SIM_HZ = 120  # Simulation ticks per second; all game timers run on ticks
+    RENDER_FPS = 60  # Frame cap for drawing, 0 for uncapped
+    VSYNC = False  # Sync drawing to the display instead of RENDER_FPS
+    MAX_TICKS_PER_FRAME = 10  # Drop simulation backlog beyond this after a stall
+    SEED = None  # Fixed game seed for reproducible runs, None for a random one
+    PREVIEW_COUNT = 5  # Upcoming pieces shown and given to bots
+    REPLAY_PATH = None  # Record every game's inputs to this file, see replay.py
+    AUTOSAVE_PATH = None  # Save the run to this file at every level up, see snapshot.py
+    RESUME_PATH = None  # Continue the run saved in this file instead of starting a new one
+    DEBUG_HASH = False  # Check the incremental board hash against a full rehash on every change
+    LOG_LEVEL = None  # 'debug', 'info', 'warning' or 'error' to record diagnostics, None for off, see log.py
+    LOG_PATH = None  # File the background log writer appends to, '-' for stderr, None to only keep the ring buffer
+    LOG_CAPACITY = 1024  # Most recent log records kept in memory
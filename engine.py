@@ -0,0 +1,371 @@
+from collections import deque
+from itertools import islice
+
+from config import Config
+from events import EventBus, LevelUp, GameOver, SpinDetected
+from bitboard import BitBoard
+from pieces import PIECE_CLASSES
+from rng import GameRng
+from score_manager import ScoreManager, LINE_CLEAR_SCORES, GRAVITY_DECAY, SPIN_BONUS
+from level_manager import LevelManager
+from shop import Shop, SHOP_SLOT_TYPES
+from spin_manager import SpinDetector
+from wallet import wallet
+from log import logger, DEBUG
+import rotation
+import zobrist
+
+# Actions that repeat while held, subject to DAS/ARR
+LEFT = 'left'
+RIGHT = 'right'
+SOFT_DROP = 'soft_drop'
+# Actions that fire once per key press
+ROTATE_CW = 'rotate_cw'
+ROTATE_CCW = 'rotate_ccw'
+ROTATE_180 = 'rotate_180'
+HARD_DROP = 'hard_drop'
+HOLD = 'hold'
+
+HELD_ACTIONS = (LEFT, RIGHT, SOFT_DROP)
+PRESSED_ACTIONS = (ROTATE_CW, ROTATE_CCW, HARD_DROP, HOLD, ROTATE_180)  # Replay codes are positions here
+SHOP_LEVELS = [1, 6, 11, 16, 21, 26]
+SHOP_GRAVITY = 500
+
+
+class Inputs:
+    def __init__(self, held=(), pressed=()):
+        self.held = held  # Actions whose key is currently down
+        self.pressed = pressed  # Actions whose key went down since the last step
+
+
+NO_INPUTS = Inputs()
+
+
+class GameState:
+    def __init__(self, seed=None, tick_rate=Config.SIM_HZ, rules=None):
+        # rules optionally overrides balance settings for sweeps: line_scores,
+        # gravity_decay and spin_bonus (see ScoreManager), shop_slots (see
+        # Shop) and preview, the number of upcoming pieces shown
+        rules = rules or {}
+        self.rng = GameRng(seed)
+        # The board, score, level, wallet and shop talk through the bus;
+        # anything else (stats, logging, a UI) can subscribe to it as well
+        self.events = EventBus()
+        self.board_width = Config.BOARD_WIDTH
+        self.level_manager = LevelManager(self.events)
+        self.score_manager = ScoreManager(self.level_manager,
+                                          rules.get('line_scores', LINE_CLEAR_SCORES),
+                                          rules.get('gravity_decay', GRAVITY_DECAY),
+                                          self.events,
+                                          rules.get('spin_bonus', SPIN_BONUS))
+        self.wallet = wallet(self.events)
+        self.shop_phase = self.level_manager.get_level() in SHOP_LEVELS
+        self.board = BitBoard(self.shop_phase, self.events)
+        self.shop = Shop(self.rng, rules.get('shop_slots', SHOP_SLOT_TYPES), self.events)
+        if self.shop_phase:
+            self.shop.open(self.board)
+        self.events.subscribe(LevelUp, self.on_level_up)
+
+        # Upcoming pieces in spawn order, refilled a whole shuffled 7-bag at
+        # a time so it always holds at least preview_count beyond the next
+        self.preview_count = rules.get('preview', Config.PREVIEW_COUNT)
+        self.bag = deque()
+        self.last_piece = None
+        self.current_piece = self.new_piece()
+        self.held_piece = None
+        self.can_hold = True
+        self.score = 0
+        self.lines_cleared = 0
+        self.last_cleared_rows = []  # Board rows removed by the last lock
+        self.running = True
+
+        self.ARR = 32  # Auto Repeat Rate
+        self.gravity = SHOP_GRAVITY if self.shop_phase else self.score_manager.get_gravity()
+        self.DAS = 68  # Delayed Auto Shift
+        self.LockDelay = 500  # Time piece is added to board upon last action
+
+        # Simulation clock: a fixed number of ticks per second, advanced only
+        # by tick(). time_ms is derived from the tick count, so every timer
+        # below behaves the same however fast frames are drawn.
+        self.tick_rate = tick_rate
+        self.tick_ms = 1000 / tick_rate
+        self.ticks = 0
+        self.time_ms = 0
+        self.accumulator = 0
+        self.pending_pressed = []  # Presses seen since the last tick
+        self.recorder = None  # Optional replay.ReplayWriter fed every tick's inputs
+        self.last_move_time = 0
+        self.last_gravity_time = 0
+        self.lock_delay_start = None  # Timer for lock delay
+        self.lock_delay_reset = False  # Flag to reset the lock delay on movements
+
+        self.key_held = {action: False for action in HELD_ACTIONS}
+        self.key_initial_time = {action: 0 for action in HELD_ACTIONS}
+        self.key_delay_over = {action: False for action in HELD_ACTIONS}
+        self.movements = {LEFT: self.move_left, RIGHT: self.move_right, SOFT_DROP: self.move_down}
+
+    def clone(self):
+        # An independent copy of the game to play ahead on, e.g. for a
+        # search branching on every move. The board rows are shared
+        # copy-on-write (see BitBoard.copy), and the rules, piece classes
+        # and rotation tables are shared outright; everything the game
+        # changes in place is copied. The copy gets its own event bus with
+        # only the game's own subscribers, and no replay recorder.
+        state = GameState.__new__(GameState)
+        state.__dict__.update(self.__dict__)
+        state.rng = self.rng.copy()
+        state.events = EventBus()
+        state.level_manager = self.level_manager.copy(state.events)
+        state.score_manager = self.score_manager.copy(state.level_manager, state.events)
+        state.wallet = self.wallet.copy(state.events)
+        state.board = self.board.copy(state.events)
+        state.shop = self.shop.copy(state.rng, state.events)
+        state.events.subscribe(LevelUp, state.on_level_up)
+
+        state.bag = deque(self.bag)
+        state.current_piece = self.current_piece.copy()
+        if self.held_piece is not None:
+            state.held_piece = self.held_piece.copy()
+        state.pending_pressed = list(self.pending_pressed)
+        state.recorder = None
+        state.key_held = dict(self.key_held)
+        state.key_initial_time = dict(self.key_initial_time)
+        state.key_delay_over = dict(self.key_delay_over)
+        state.movements = {LEFT: state.move_left, RIGHT: state.move_right, SOFT_DROP: state.move_down}
+        return state
+
+    def fill_bag(self):
+        missing = self.preview_count + 1 - len(self.bag)
+        if missing > 0:
+            bags = -(-missing // 7)
+            self.bag.extend(PIECE_CLASSES[piece_type] for piece_type in self.rng.next_bags(bags))
+
+    def new_piece(self):
+        self.fill_bag()
+        new_piece = self.bag.popleft()
+        self.last_piece = new_piece
+        return new_piece()
+
+    def preview(self):
+        # Types of the next preview_count pieces, next first. Read-only:
+        # new_piece leaves at least preview_count in the bag.
+        return tuple(piece_class.type for piece_class in islice(self.bag, self.preview_count))
+
+    def state_hash(self):
+        # 64-bit Zobrist hash of the board, current piece, held piece and bag;
+        # only the piece part is computed here, the board keeps its own
+        value = self.board.hash ^ zobrist.piece_key(self.current_piece)
+        if self.held_piece is not None:
+            value ^= zobrist.HOLD_KEYS[self.held_piece.type]
+        bag_keys = zobrist.bag_keys(len(self.bag))
+        for position, piece_class in enumerate(self.bag):
+            value ^= bag_keys[position][piece_class.type]
+        return value
+
+    def step(self, inputs, dt_ms):
+        # Run as many whole ticks as dt_ms covers; leftover time carries over
+        # to the next call. Returns the number of ticks run.
+        self.pending_pressed.extend(inputs.pressed)
+        self.accumulator += dt_ms
+        ticks = 0
+        while self.accumulator >= self.tick_ms and self.running:
+            if ticks == Config.MAX_TICKS_PER_FRAME:
+                self.accumulator = 0
+                break
+            self.tick(Inputs(inputs.held, self.pending_pressed))
+            self.pending_pressed = []
+            self.accumulator -= self.tick_ms
+            ticks += 1
+        return ticks
+
+    def tick(self, inputs):
+        if not self.running:
+            return
+        self.ticks += 1
+        self.time_ms = self.ticks * 1000 / self.tick_rate
+        if self.recorder is not None:
+            self.recorder.record(self.ticks, inputs)
+        self.handle_input(inputs)
+        if self.running:
+            self.update()
+
+    def handle_input(self, inputs):
+        current_time = self.time_ms
+        for action in HELD_ACTIONS:
+            if action in inputs.held:
+                if not self.key_held[action]:
+                    self.key_held[action] = True
+                    self.key_initial_time[action] = current_time
+                    self.handle_movement(self.movements[action], initial=True)
+                else:
+                    if not self.key_delay_over[action]:
+                        if current_time - self.key_initial_time[action] >= self.DAS:
+                            self.key_delay_over[action] = True
+                            self.last_move_time = current_time
+                    if self.key_delay_over[action]:
+                        self.handle_movement(self.movements[action])
+            else:
+                self.key_held[action] = False
+                self.key_delay_over[action] = False
+
+        for action in inputs.pressed:
+            if not self.running:
+                break
+            self.perform(action)
+
+    def perform(self, action):
+        # Carry out one action right away, without DAS/ARR timing; used for
+        # key presses and by bots playing a placement path
+        if action in self.movements:
+            self.movements[action]()
+        elif action == ROTATE_CW:
+            self.rotate_piece(rotation.CW)
+        elif action == ROTATE_CCW:
+            self.rotate_piece(rotation.CCW)
+        elif action == ROTATE_180:
+            self.rotate_piece(rotation.HALF)
+        elif action == HARD_DROP:
+            self.hard_drop()
+        elif action == HOLD:
+            self.hold_piece()
+
+    def handle_movement(self, movement_func, initial=False):
+        current_time = self.time_ms
+        if initial or current_time - self.last_move_time >= self.ARR:
+            movement_func()
+            self.last_move_time = current_time
+            self.lock_delay_start = None  # Reset lock delay timer on movement/rotation
+            self.lock_delay_reset = True  # Indicate that lock delay should be reset
+
+    def move_left(self):
+        if self.board.can_move(self.current_piece, -1, 0, self.shop_phase):
+            self.current_piece.x -= 1
+            self.current_piece.kick_index = None
+
+    def move_right(self):
+        if self.board.can_move(self.current_piece, 1, 0, self.shop_phase):
+            self.current_piece.x += 1
+            self.current_piece.kick_index = None
+
+    def move_down(self):
+        if self.board.can_move(self.current_piece, 0, 1, self.shop_phase):
+            self.current_piece.y += 1
+            self.current_piece.kick_index = None
+
+    def rotate_piece(self, turn=rotation.CW):
+        self.lock_delay_start = None
+        piece = self.current_piece
+        kicked = rotation.resolve(self.board, piece, turn, self.shop_phase)
+        if kicked is None:
+            if logger.enabled(DEBUG):
+                logger.debug('rotate_blocked', piece=piece.type, turn=turn)
+            return
+        piece.current_state, x_offset, y_offset, piece.kick_index = kicked
+        piece.kick_turn = turn
+        piece.x += x_offset
+        piece.y += y_offset
+        piece.currentWallkick = (x_offset, y_offset)
+        if logger.enabled(DEBUG):  # Skip building the fields on every turn
+            logger.debug('rotate', piece=piece.type, to=piece.current_state, kick=(x_offset, y_offset))
+
+    def hard_drop(self):
+        distance = self.board.drop_distance(self.current_piece)
+        if distance:
+            self.current_piece.y += distance
+            self.current_piece.kick_index = None
+        self.lock_piece()  # Lock the piece immediately on hard drop
+
+    def hold_piece(self):
+        if not self.can_hold:
+            return
+        if self.held_piece is None:
+            self.held_piece = self.current_piece
+            self.current_piece = self.new_piece()
+        else:
+            self.current_piece, self.held_piece = self.held_piece, self.current_piece
+            self.current_piece.x = self.board_width // 2 - len(self.current_piece.shape[0]) // 2
+            self.current_piece.y = 0  # Start the piece in the hidden rows
+            self.current_piece.current_state = 0  # Reset to original state
+            self.current_piece.kick_index = None
+        self.can_hold = False
+        self.lock_delay_start = None  # Reset lock delay timer on hold
+        self.lock_delay_reset = True  # Indicate that lock delay should be reset
+
+    def lock_piece(self):
+        # The shop checks its slots on PieceLocked and the score and level
+        # move on LinesCleared, which also opens or closes the shop. A spin
+        # is judged before the piece is written and published once the
+        # lines it cleared are known.
+        piece = self.current_piece
+        spin = SpinDetector.detect_spin(self.board, piece, self.shop_phase)
+        self.board.add_piece(piece)
+        self.last_cleared_rows = self.board.clear_lines()
+        if spin is not None:
+            self.events.emit(SpinDetected, piece.type, spin, len(self.last_cleared_rows))
+
+        self.score = self.score_manager.get_score()
+        self.lines_cleared = self.score_manager.get_lines_cleared()
+        if not self.shop_phase:
+            self.gravity = self.score_manager.get_gravity()
+
+        self.current_piece = self.new_piece()
+        self.can_hold = True
+        self.lock_delay_start = None  # Reset the lock delay timer for the new piece
+        self.lock_delay_reset = False  # Reset the lock delay reset flag
+
+        if any(self.board.grid[y][x] != 0 for y in range(1) for x in range(self.board.width)):
+            self.running = False
+            self.events.emit(GameOver, self.score, self.lines_cleared)
+            logger.info('game_over', lines=self.lines_cleared, score=self.score)
+
+    def on_level_up(self, event):
+        self.update_shop_phase()
+
+    def update_shop_phase(self):
+        if self.level_manager.get_level() in SHOP_LEVELS:
+            if not self.shop_phase:
+                self.shop.open(self.board)
+                self.shop_phase = True
+            self.gravity = SHOP_GRAVITY
+        elif self.shop_phase:
+            self.shop.close(self.board)
+            self.shop_phase = False
+            self.gravity = self.score_manager.get_gravity()
+
+    def update(self):
+        current_time = self.time_ms
+        if current_time - self.last_gravity_time >= self.gravity:
+            if self.board.drop_distance(self.current_piece) > 0:
+                self.current_piece.y += 1
+                self.current_piece.kick_index = None
+                self.lock_delay_start = None  # Reset lock delay timer on movement
+                self.lock_delay_reset = False  # Piece moved down, reset should not apply
+            else:
+                if self.lock_delay_start is None:
+                    self.lock_delay_start = current_time
+                elif current_time - self.lock_delay_start >= self.LockDelay:
+                    if not self.lock_delay_reset:
+                        self.lock_piece()
+                    else:
+                        self.lock_delay_start = current_time  # Reset the timer if there was a recent move
+
+            self.last_gravity_time = current_time
+
+        # Additional check for soft drop lock
+        if self.board.drop_distance(self.current_piece) == 0:
+            if self.lock_delay_start is None:
+                self.lock_delay_start = current_time
+            elif current_time - self.lock_delay_start >= self.LockDelay:
+                if not self.lock_delay_reset:
+                    self.lock_piece()
+                else:
+                    self.lock_delay_start = current_time  # Reset the timer if there was a recent move
+                    if self.board.drop_distance(self.current_piece) == 0:
+                        self.lock_piece()
+
+            self.last_gravity_time = current_time
+
+    def lock_time_remaining(self):
+        if self.lock_delay_start is None:
+            return 0
+        return max(0, int(self.LockDelay - (self.time_ms - self.lock_delay_start)))
@@ -0,0 +1,104 @@
+# Event records. The bus keeps one instance of each and refills it for every
+# emit, so a handler must copy any field it wants to keep past its return.
+
+
+class PieceLocked:
+    __slots__ = ('board', 'piece', 'written')
+
+    def __init__(self, board=None, piece=None, written=()):
+        self.board = board
+        self.piece = piece
+        self.written = written  # (row, row bits) of the cells the piece set, see BitBoard.written
+
+
+class LinesCleared:
+    __slots__ = ('rows', 'count', 'all_clear')
+
+    def __init__(self, rows=(), count=0, all_clear=False):
+        self.rows = rows  # Board rows removed, top to bottom
+        self.count = count
+        self.all_clear = all_clear  # Nothing left in the main well afterwards
+
+
+class SpinDetected:
+    __slots__ = ('piece_type', 'spin', 'lines')
+
+    def __init__(self, piece_type=None, spin=None, lines=0):
+        self.piece_type = piece_type
+        self.spin = spin
+        self.lines = lines  # Lines the spinning piece cleared
+
+
+class Purchase:
+    __slots__ = ('slot_type', 'index')
+
+    def __init__(self, slot_type=None, index=0):
+        self.slot_type = slot_type
+        self.index = index  # Shop slot position, 0 to 2
+
+
+class LevelUp:
+    __slots__ = ('level',)
+
+    def __init__(self, level=0):
+        self.level = level
+
+
+class GameOver:
+    __slots__ = ('score', 'lines')
+
+    def __init__(self, score=0, lines=0):
+        self.score = score
+        self.lines = lines
+
+
+EVENT_TYPES = (PieceLocked, LinesCleared, SpinDetected, Purchase, LevelUp, GameOver)
+
+
+class EventBus:
+    # Synchronous dispatch: emit() calls every handler before it returns.
+    # An event nobody subscribed to costs one dict lookup.
+    #
+    # Batched handlers, for headless runs that only want totals, are not
+    # called on emit; the event's fields are queued as a tuple (in __slots__
+    # order) and flush() hands each handler its whole list at once.
+    def __init__(self):
+        self.handlers = {}  # Event class -> handlers called on emit
+        self.batch_handlers = {}  # Event class -> handlers called by flush
+        self.queues = {}  # Event class -> field tuples waiting for flush
+        self.records = {event_class: event_class() for event_class in EVENT_TYPES}
+
+    def subscribe(self, event_class, handler, batched=False):
+        handlers = self.batch_handlers if batched else self.handlers
+        handlers.setdefault(event_class, []).append(handler)
+        if batched:
+            self.queues.setdefault(event_class, [])
+
+    def unsubscribe(self, event_class, handler):
+        for handlers in (self.handlers, self.batch_handlers):
+            listed = handlers.get(event_class)
+            if listed and handler in listed:
+                listed.remove(handler)
+                if not listed:
+                    del handlers[event_class]
+        if event_class not in self.batch_handlers:
+            self.queues.pop(event_class, None)
+
+    def emit(self, event_class, *fields):
+        queue = self.queues.get(event_class)
+        if queue is not None:
+            queue.append(fields)
+        handlers = self.handlers.get(event_class)
+        if handlers:
+            record = self.records[event_class]
+            record.__init__(*fields)
+            for handler in handlers:
+                handler(record)
+
+    def flush(self):
+        for event_class, queue in self.queues.items():
+            if queue:
+                batch = list(queue)
+                queue.clear()
+                for handler in self.batch_handlers.get(event_class, ()):
+                    handler(batch)
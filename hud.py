@@ -0,0 +1,76 @@
+from collections import OrderedDict
+import pygame
+
+_fonts = {}
+
+
+def get_font(name=None, size=30):
+    # Fonts are loaded once per (name, size) for the life of the process
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.Font(name, size)
+    return font
+
+
+class TextCache:
+    # Rendered text surfaces keyed by (string, color), least recently used
+    # entries are dropped once the cache is full
+    def __init__(self, font, max_entries=256):
+        self.font = font
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self.entries.get(key)
+        if surface is None:
+            surface = self.font.render(text, True, color)
+            self.entries[key] = surface
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return surface
+
+
+class Hud:
+    # A column of "label: value" lines. Labels are rendered once; a line is
+    # only repainted when its value changes.
+    def __init__(self, screen, background, labels, topleft, line_height, color, font=None):
+        self.screen = screen
+        self.background = background
+        self.labels = labels
+        self.left, self.top = topleft
+        self.line_height = line_height
+        self.color = color
+        self.text = TextCache(font or get_font())
+        self.values = [None] * len(labels)
+        self.rects = [None] * len(labels)
+
+    def invalidate(self):
+        # Forget what is on screen, e.g. after a full repaint
+        self.values = [None] * len(self.labels)
+        self.rects = [None] * len(self.labels)
+
+    def draw(self, values):
+        dirty = []
+        for i, value in enumerate(values):
+            if value == self.values[i]:
+                continue
+            self.values[i] = value
+            old_rect = self.rects[i]
+            if old_rect is not None:
+                self.screen.blit(self.background, old_rect, old_rect)
+                dirty.append(old_rect)
+
+            label = self.text.render(self.labels[i], self.color)
+            text = self.text.render(str(value), self.color)
+            y = self.top + i * self.line_height
+            self.screen.blit(label, (self.left, y))
+            self.screen.blit(text, (self.left + label.get_width(), y))
+            rect = pygame.Rect(self.left, y, label.get_width() + text.get_width(),
+                               max(label.get_height(), text.get_height()))
+            self.rects[i] = rect
+            dirty.append(rect)
+        return dirty
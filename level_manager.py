@@ -1,9 +1,21 @@
+from events import LevelUp
+
+
 class LevelManager:
-    def __init__(self):
+    def __init__(self, events=None):
         self.level = 1
+        self.events = events
 
     def update_level(self, lines_cleared):
+        previous_level = self.level
         self.level = lines_cleared // 10 + 1
+        if self.level > previous_level and self.events is not None:
+            self.events.emit(LevelUp, self.level)
+
+    def copy(self, events=None):
+        level_manager = LevelManager(events)
+        level_manager.level = self.level
+        return level_manager
 
     def get_level(self):
         return self.level
@@ -0,0 +1,101 @@
+import atexit
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+from config import Config
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+LEVEL_NAMES = {value: name.upper() for name, value in LEVELS.items()}
+_STOP = object()
+
+
+def _off(event, **fields):
+    pass
+
+
+class Logger:
+    # Structured records (time, level, event name, fields) for diagnostics on
+    # the game thread. Each record is appended to a ring buffer of the most
+    # recent ones and, with a stream, queued for a background thread that
+    # formats and writes it, so logging never waits on I/O.
+    #
+    # Levels below the threshold are bound to a no-op, and level None turns
+    # everything off. A call site that builds expensive fields can check
+    # enabled() first.
+    def __init__(self, level=None, stream=None, capacity=1024):
+        self.records = deque(maxlen=capacity)
+        self.stream = stream
+        self.queue = queue.SimpleQueue()
+        self.writer = None
+        self.set_level(level)
+
+    def set_level(self, level):
+        if isinstance(level, str):
+            level = LEVELS[level]
+        self.level = level
+        for name, value in LEVELS.items():
+            if level is None or value < level:
+                setattr(self, name, _off)
+            else:
+                setattr(self, name, lambda event, _level=value, **fields: self.log(_level, event, **fields))
+
+    def enabled(self, level):
+        return self.level is not None and level >= self.level
+
+    def log(self, level, event, **fields):
+        record = (time.perf_counter(), level, event, fields)
+        self.records.append(record)
+        if self.stream is not None:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write, name='log-writer', daemon=True)
+                self.writer.start()
+            self.queue.put(record)
+
+    def recent(self, count=None):
+        # The last count records still in the ring buffer, oldest first
+        records = list(self.records)
+        return records if count is None else records[-count:]
+
+    def close(self):
+        # Wait for queued records to be written
+        if self.writer is not None:
+            self.queue.put(_STOP)
+            self.writer.join()
+            self.writer = None
+
+    def _write(self):
+        stream = self.stream
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                break
+            stream.write(format_record(record))
+            if self.queue.empty():
+                stream.flush()
+        stream.flush()
+
+
+def format_record(record):
+    timestamp, level, event, fields = record
+    parts = [f"{timestamp:.6f}", LEVEL_NAMES[level], event]
+    parts.extend(f"{key}={value}" for key, value in fields.items())
+    return ' '.join(parts) + '\n'
+
+
+def _open_stream(path):
+    if path is None:
+        return None
+    if path == '-':
+        return sys.stderr
+    return open(path, 'a', buffering=1 << 16)
+
+
+logger = Logger(Config.LOG_LEVEL, _open_stream(Config.LOG_PATH), Config.LOG_CAPACITY)
+atexit.register(logger.close)
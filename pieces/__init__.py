@@ -1,7 +1,2 @@
-from .i_piece import IPiece
-from .o_piece import OPiece
-from .t_piece import TPiece
-from .s_piece import SPiece
-from .z_piece import ZPiece
-from .j_piece import JPiece
-from .l_piece import LPiece
+from .piece import Piece, IPiece, OPiece, TPiece, SPiece, ZPiece, JPiece, LPiece, PIECE_CLASSES
+from .table import ROTATION_TABLE, PIECE_TYPES
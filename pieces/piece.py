@@ -0,0 +1,103 @@
+from .table import ROTATION_TABLE
+
+
+class Piece:
+    # A piece is only its rotation index and position; all geometry is read
+    # from the shared ROTATION_TABLE through the class attributes below.
+    # kick_index is the kick used by the last move if it was a rotation,
+    # None otherwise, and kick_turn the turn (rotation.CW, HALF or CCW) it
+    # belongs to, for spin detection.
+    __slots__ = ('current_state', 'x', 'y', 'currentWallkick', 'kick_index', 'kick_turn')
+    type = None
+    geometry = None
+    color = None
+    states = ()
+
+    def __init__(self):
+        self.current_state = 0
+        self.x = self.geometry.spawn_x
+        self.y = self.geometry.spawn_y
+        self.currentWallkick = (0, 0)
+        self.kick_index = None
+        self.kick_turn = None
+
+    @property
+    def shape(self):
+        return self.states[self.current_state]
+
+    @property
+    def cells(self):
+        return self.geometry.cells[self.current_state]
+
+    @property
+    def row_masks(self):
+        return self.geometry.row_masks[self.current_state]
+
+    def copy(self):
+        copied_piece = self.__class__.__new__(self.__class__)
+        copied_piece.current_state = self.current_state
+        copied_piece.x = self.x
+        copied_piece.y = self.y
+        copied_piece.currentWallkick = self.currentWallkick
+        copied_piece.kick_index = self.kick_index
+        copied_piece.kick_turn = self.kick_turn
+        return copied_piece
+
+
+class IPiece(Piece):
+    __slots__ = ()
+    type = 'I'
+    geometry = ROTATION_TABLE['I']
+    color = geometry.color
+    states = geometry.states
+
+
+class OPiece(Piece):
+    __slots__ = ()
+    type = 'O'
+    geometry = ROTATION_TABLE['O']
+    color = geometry.color
+    states = geometry.states
+
+
+class TPiece(Piece):
+    __slots__ = ()
+    type = 'T'
+    geometry = ROTATION_TABLE['T']
+    color = geometry.color
+    states = geometry.states
+
+
+class SPiece(Piece):
+    __slots__ = ()
+    type = 'S'
+    geometry = ROTATION_TABLE['S']
+    color = geometry.color
+    states = geometry.states
+
+
+class ZPiece(Piece):
+    __slots__ = ()
+    type = 'Z'
+    geometry = ROTATION_TABLE['Z']
+    color = geometry.color
+    states = geometry.states
+
+
+class JPiece(Piece):
+    __slots__ = ()
+    type = 'J'
+    geometry = ROTATION_TABLE['J']
+    color = geometry.color
+    states = geometry.states
+
+
+class LPiece(Piece):
+    __slots__ = ()
+    type = 'L'
+    geometry = ROTATION_TABLE['L']
+    color = geometry.color
+    states = geometry.states
+
+
+PIECE_CLASSES = {piece_class.type: piece_class for piece_class in (IPiece, OPiece, TPiece, SPiece, ZPiece, JPiece, LPiece)}
@@ -0,0 +1,173 @@
+from collections import namedtuple
+
+# Geometry for every piece rotation, built once at import and shared by all
+# piece instances, the bitboard and the batch simulator.
+#   states:    shape matrices, indexed by rotation
+#   cells:     (x, y) offsets of occupied cells per rotation
+#   bounds:    (min_x, min_y, max_x, max_y) of the occupied cells per rotation
+#   row_masks: (row offset, bitmask) for each non-empty row per rotation
+#   column_bottoms: (column offset, lowest row offset) per occupied column per rotation
+PieceGeometry = namedtuple('PieceGeometry', ['type', 'color', 'states', 'cells', 'bounds', 'row_masks',
+                                             'column_bottoms', 'spawn_x', 'spawn_y'])
+
+SPAWN_Y = -2  # Pieces spawn in the hidden rows
+
+SHAPES = {
+    'I': [
+        [[0, 0, 0, 0],
+         [1, 1, 1, 1],
+         [0, 0, 0, 0],
+         [0, 0, 0, 0]],
+
+        [[0, 0, 1, 0],
+         [0, 0, 1, 0],
+         [0, 0, 1, 0],
+         [0, 0, 1, 0]],
+
+        [[0, 0, 0, 0],
+         [0, 0, 0, 0],
+         [1, 1, 1, 1],
+         [0, 0, 0, 0]],
+
+        [[0, 1, 0, 0],
+         [0, 1, 0, 0],
+         [0, 1, 0, 0],
+         [0, 1, 0, 0]]
+    ],
+    'O': [
+        [[1, 1],
+         [1, 1]]
+    ],
+    'T': [
+        [[0, 1, 0],
+         [1, 1, 1],
+         [0, 0, 0]],
+
+        [[0, 1, 0],
+         [0, 1, 1],
+         [0, 1, 0]],
+
+        [[0, 0, 0],
+         [1, 1, 1],
+         [0, 1, 0]],
+
+        [[0, 1, 0],
+         [1, 1, 0],
+         [0, 1, 0]]
+    ],
+    'S': [
+        [[0, 1, 1],
+         [1, 1, 0],
+         [0, 0, 0]],
+
+        [[0, 1, 0],
+         [0, 1, 1],
+         [0, 0, 1]],
+
+        [[0, 0, 0],
+         [0, 1, 1],
+         [1, 1, 0]],
+
+        [[1, 0, 0],
+         [1, 1, 0],
+         [0, 1, 0]]
+    ],
+    'Z': [
+        [[1, 1, 0],
+         [0, 1, 1],
+         [0, 0, 0]],
+
+        [[0, 0, 1],
+         [0, 1, 1],
+         [0, 1, 0]],
+
+        [[0, 0, 0],
+         [1, 1, 0],
+         [0, 1, 1]],
+
+        [[0, 1, 0],
+         [1, 1, 0],
+         [1, 0, 0]]
+    ],
+    'J': [
+        [[1, 0, 0],
+         [1, 1, 1],
+         [0, 0, 0]],
+
+        [[0, 1, 1],
+         [0, 1, 0],
+         [0, 1, 0]],
+
+        [[0, 0, 0],
+         [1, 1, 1],
+         [0, 0, 1]],
+
+        [[0, 1, 0],
+         [0, 1, 0],
+         [1, 1, 0]]
+    ],
+    'L': [
+        [[0, 0, 1],
+         [1, 1, 1],
+         [0, 0, 0]],
+
+        [[0, 1, 0],
+         [0, 1, 0],
+         [0, 1, 1]],
+
+        [[0, 0, 0],
+         [1, 1, 1],
+         [1, 0, 0]],
+
+        [[1, 1, 0],
+         [0, 1, 0],
+         [0, 1, 0]]
+    ],
+}
+
+COLORS = {
+    'I': (0, 255, 255),  # CYAN
+    'O': (255, 255, 0),  # YELLOW
+    'T': (160, 32, 240),  # PURPLE
+    'S': (0, 255, 0),  # GREEN
+    'Z': (255, 0, 0),  # RED
+    'J': (0, 0, 255),  # BLUE
+    'L': (255, 165, 0),  # ORANGE
+}
+
+SPAWN_X = {'I': 3, 'O': 4, 'T': 3, 'S': 3, 'Z': 3, 'J': 3, 'L': 3}
+
+PIECE_TYPES = ('I', 'O', 'T', 'S', 'Z', 'J', 'L')
+
+
+def _build(piece_type):
+    states = []
+    cells = []
+    bounds = []
+    row_masks = []
+    column_bottoms = []
+    for shape in SHAPES[piece_type]:
+        states.append(tuple(tuple(row) for row in shape))
+        offsets = tuple((x, y) for y, row in enumerate(shape) for x, cell in enumerate(row) if cell)
+        cells.append(offsets)
+        xs = [x for x, _ in offsets]
+        ys = [y for _, y in offsets]
+        bounds.append((min(xs), min(ys), max(xs), max(ys)))
+        masks = []
+        for y, row in enumerate(shape):
+            mask = 0
+            for x, cell in enumerate(row):
+                if cell:
+                    mask |= 1 << x
+            if mask:
+                masks.append((y, mask))
+        row_masks.append(tuple(masks))
+        bottoms = {}
+        for x, y in offsets:
+            bottoms[x] = max(y, bottoms.get(x, y))
+        column_bottoms.append(tuple(sorted(bottoms.items())))
+    return PieceGeometry(piece_type, COLORS[piece_type], tuple(states), tuple(cells), tuple(bounds),
+                         tuple(row_masks), tuple(column_bottoms), SPAWN_X[piece_type], SPAWN_Y)
+
+
+ROTATION_TABLE = {piece_type: _build(piece_type) for piece_type in PIECE_TYPES}
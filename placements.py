@@ -0,0 +1,326 @@
+from collections import namedtuple
+from heapq import heappush, heappop
+
+from config import Config
+from bitboard import PAD
+from engine import LEFT, RIGHT, SOFT_DROP, ROTATE_CW, ROTATE_CCW, ROTATE_180, HARD_DROP
+from pieces import ROTATION_TABLE
+from rotation import ROTATIONS, CW, CCW, HALF
+
+# A lock position and the actions that take the piece there from where it
+# started, ending in HARD_DROP, or None where only positions were asked
+# for. SOFT_DROP moves one row.
+Placement = namedtuple('Placement', ['x', 'y', 'rotation', 'path'])
+
+# Bit s of a position mask is the pose with x = s - PAD; only poses whose
+# left edge is inside the grid are considered, the walls rule out the rest
+POSITIONS = (1 << (PAD + Config.BOARD_WIDTH + Config.SHOP_WIDTH)) - 1
+TOP = -8  # Highest row a kick can lift a piece to
+TURNS = ((ROTATE_CW, CW), (ROTATE_CCW, CCW), (ROTATE_180, HALF))  # Turns the search tries, with the action for each
+
+
+def _duplicates(geometry):
+    # (r2, r1, dx, dy) for r1 < r2 where rotation r2 at (x, y) fills the
+    # same cells as rotation r1 at (x + dx, y + dy)
+    shapes = []
+    for cells, (min_x, min_y, _, _) in zip(geometry.cells, geometry.bounds):
+        shapes.append(frozenset((x - min_x, y - min_y) for x, y in cells))
+    return tuple((r2, r1, geometry.bounds[r2][0] - geometry.bounds[r1][0],
+                  geometry.bounds[r2][1] - geometry.bounds[r1][1])
+                 for r2 in range(len(shapes)) for r1 in range(r2) if shapes[r1] == shapes[r2])
+
+
+DUPLICATES = {piece_type: _duplicates(geometry) for piece_type, geometry in ROTATION_TABLE.items()}
+
+
+def find_placements(board, piece, shop_phase):
+    # Every lock position the piece can reach from its current pose, moving
+    # left, right, turning a quarter or half turn with kicks and dropping.
+    # Poses that fill the same cells (O, and the S/Z/I rotation pairs) are
+    # reported once. Paths are left out (None): a caller that settles on a
+    # placement gets the actions for it from find_path. board must be a
+    # BitBoard.
+    return lock_positions([row.mask for row in board.grid], board.walls[shop_phase], piece)
+
+
+def find_path(board, piece, shop_phase, placement):
+    # The actions that take piece from its current pose to placement,
+    # ending in HARD_DROP
+    return search_path([row.mask for row in board.grid], board.walls[shop_phase], piece, placement)
+
+
+def search_path(rows, walls, piece, placement, fits=None):
+    # find_path on raw BitBoard row masks, for callers such as the bot that
+    # keep boards as plain lists of ints; fits is the piece's fit_table if
+    # the caller has one. None if the placement cannot be reached.
+    #
+    # A plain route slides the piece along the row it is on, turns it at
+    # most once (before or after sliding) and lets it fall straight down,
+    # which reaches most of the board. A breadth-first search runs
+    # backwards from the placement, undoing one move at a time, until it
+    # meets a pose on a plain route; so only tucks and spins cost a search,
+    # and only around the placement.
+    geometry = piece.geometry
+    num_states = len(geometry.states)
+    rotations = ROTATIONS[piece.type]
+    if fits is None:
+        fits = fit_table(rows, walls, geometry)
+    rows_count = len(fits[0])
+
+    def fits_at(r, s, i):
+        return 0 <= i < rows_count and s >= 0 and fits[r][i] >> s & 1
+
+    # The piece slides along its own row (run0), and after a turn where it
+    # is along the row the kick left it on (runs[r], from start[r])
+    r0 = piece.current_state
+    s0 = piece.x + PAD
+    i0 = piece.y - TOP
+
+    def free_run(r, s, i):
+        row_fits = fits[r][i]
+        bit = 1 << s
+        run = (row_fits & ~(row_fits + bit)) | bit
+        return run | (bit - (1 << (~row_fits & (bit - 1)).bit_length()))
+
+    def slide(start, s):
+        return [RIGHT if s > start else LEFT] * abs(s - start)
+
+    run0 = free_run(r0, s0, i0)
+    turn_to = [None] * num_states  # (action, kicks) of the turn from r0
+    start = [None] * num_states
+    runs = [0] * num_states
+    if num_states > 1:
+        for action, turn in TURNS:
+            rotation = rotations[r0][turn]
+            turn_to[rotation.to] = (action, rotation.kicks)
+            for kx, ky in rotation.kicks:
+                if fits_at(rotation.to, s0 + kx, i0 + ky):
+                    start[rotation.to] = (s0 + kx, i0 + ky)
+                    runs[rotation.to] = free_run(rotation.to, s0 + kx, i0 + ky)
+                    break
+    routes = {}
+
+    def plain_route(r, s):
+        # (actions, row) that put the piece in rotation r at column s with
+        # nothing but sliding and at most one turn, or None
+        if r == r0:
+            return (slide(s0, s), i0) if run0 >> s & 1 else None
+        action, kicks = turn_to[r]
+        if runs[r] >> s & 1:
+            return [action] + slide(start[r][0], s), start[r][1]
+        # Slide first, then turn: the turn must land here with its kick
+        for k, (kx, ky) in enumerate(kicks):
+            sa = s - kx
+            if sa >= 0 and run0 >> sa & 1 and fits_at(r, s, i0 + ky):
+                if not any(fits_at(r, sa + ex, i0 + ey) for ex, ey in kicks[:k]):
+                    return slide(s0, sa) + [action], i0 + ky
+        return None
+
+    def fall_path(r, s, i):
+        # One of the above, then a straight fall to (r, s, i), or None
+        route = routes.get((r, s), False)
+        if route is False:
+            route = plain_route(r, s)
+            if route is not None:
+                actions, row = route
+                depth = row
+                while fits[r][depth + 1] >> s & 1:
+                    depth += 1
+                route = (actions, row, depth)
+            routes[r, s] = route
+        if route is None or not route[1] <= i <= route[2]:
+            return None
+        actions, row, _ = route
+        return actions + [SOFT_DROP] * (i - row)
+
+    def plain_path(r, s, i):
+        # A plain route to (r, s, i), ending with a slide along row i from
+        # the nearest column the piece can fall to. None if there is none.
+        path = fall_path(r, s, i)
+        if path is not None:
+            return path
+        run = free_run(r, s, i)
+        reach = max(s - (run & -run).bit_length() + 1, run.bit_length() - 1 - s)
+        for d in range(1, reach + 1):
+            for t in (s - d, s + d):
+                if t >= 0 and run >> t & 1:
+                    path = fall_path(r, t, i)
+                    if path is not None:
+                        return path + slide(t, s)
+        return None
+
+    # Turns that end in each rotation: (from rotation, action, kicks)
+    turns_into = [[] for _ in range(num_states)]
+    if num_states > 1:
+        for r in range(num_states):
+            for action, turn in TURNS:
+                rotation = rotations[r][turn]
+                turns_into[rotation.to].append((r, action, rotation.kicks))
+
+    # Start from the placement's pose and any pose that fills the same
+    # cells. following maps a pose to the pose one move nearer the
+    # placement and that move.
+    goal = (placement.rotation, placement.x + PAD, placement.y - TOP)
+    goals = [goal]
+    for r2, r1, dx, dy in DUPLICATES[piece.type]:
+        if goal[0] == r1:
+            goals.append((r2, goal[1] - dx, goal[2] - dy))
+        elif goal[0] == r2:
+            goals.append((r1, goal[1] + dx, goal[2] + dy))
+    following = {pose: None for pose in goals if fits_at(*pose)}
+    queue = list(following)
+    for pose in queue:
+        path = plain_path(*pose)
+        if path is not None:
+            while following[pose] is not None:
+                pose, action = following[pose]
+                path.append(action)
+            # Falling the rest of the way is what the hard drop does anyway
+            while path and path[-1] == SOFT_DROP:
+                path.pop()
+            path.append(HARD_DROP)
+            return path
+        r, s, i = pose
+        before = [((r, s - 1, i), RIGHT), ((r, s + 1, i), LEFT), ((r, s, i - 1), SOFT_DROP)]
+        for source, action, kicks in turns_into[r]:
+            # A turn from source lands here with kick k only if every
+            # earlier kick is blocked
+            for k, (kx, ky) in enumerate(kicks):
+                ps = s - kx
+                pi = i - ky
+                if fits_at(source, ps, pi) and not any(fits_at(r, ps + ex, pi + ey) for ex, ey in kicks[:k]):
+                    before.append(((source, ps, pi), action))
+        for previous, action in before:
+            if previous not in following and fits_at(*previous):
+                following[previous] = (pose, action)
+                queue.append(previous)
+    return None
+
+
+def fit_table(rows, walls, geometry):
+    # fits[r][y - TOP]: bit s set where rotation r fits at x = s - PAD and
+    # row y, plus a row of zeros below the floor. A row mask blocks the
+    # same positions wherever it sits in the piece, so each one is spread
+    # over the board's rows once and shared between rotations; identical
+    # board rows (all the empty ones) are spread once as well.
+    solid = (1 << (POSITIONS.bit_length() + 8)) - 1
+    occupied = [walls] * -TOP + [mask | walls for mask in rows] + [solid] * 4
+    distinct = set(occupied)
+    count = len(rows) - TOP
+    blocked = {}
+    fits = []
+    for masks in geometry.row_masks:
+        parts = []
+        for dy, mask in masks:
+            spread = blocked.get(mask)
+            if spread is None:
+                offsets = [cx for cx in range(mask.bit_length()) if mask >> cx & 1]
+                by_row = {}
+                for occ in distinct:
+                    value = 0
+                    for cx in offsets:
+                        value |= occ >> cx
+                    by_row[occ] = value
+                spread = blocked[mask] = [by_row[occ] for occ in occupied]
+            parts.append(spread[dy:dy + count])
+        if len(parts) == 1:
+            rotation_fits = [POSITIONS & ~a for a in parts[0]]
+        else:
+            rotation_fits = [POSITIONS & ~(a | b) for a, b in zip(parts[0], parts[1])]
+            for part in parts[2:]:
+                rotation_fits = [value & ~a for value, a in zip(rotation_fits, part)]
+        rotation_fits.append(0)  # Nothing fits below the floor
+        fits.append(rotation_fits)
+    return fits
+
+
+def lock_positions(rows, walls, piece, fits=None):
+    # The placements find_placements reports, on raw BitBoard row masks.
+    # Instead of visiting poses one at a time this floods a bitmask of
+    # reachable x positions per (rotation, row): a row of poses moves
+    # sideways, down or through a kick in a handful of shifts. Rows are
+    # taken top down, so new poses for a row pile up before it is looked
+    # at and most rows are only flooded once. fits is the piece's
+    # fit_table if the caller has one.
+    geometry = piece.geometry
+    num_states = len(geometry.states)
+    rotations = ROTATIONS[piece.type]
+    if fits is None:
+        fits = fit_table(rows, walls, geometry)
+
+    # reach and todo are indexed by (y - TOP) << 2 | rotation; heap holds
+    # the indexes whose todo is not empty
+    size = (len(rows) - TOP) << 2
+    reach = [0] * size
+    todo = [0] * size
+    turns = [[(rotations[r][turn].to, fits[rotations[r][turn].to], rotations[r][turn].kicks) for _, turn in TURNS]
+             if num_states > 1 else () for r in range(num_states)]
+    start = (piece.y - TOP) << 2 | piece.current_state
+    todo[start] = 1 << (piece.x + PAD)
+    heap = [start]
+    while heap:
+        key = heappop(heap)
+        new = todo[key] & ~reach[key]
+        todo[key] = 0
+        if not new:
+            continue
+        r = key & 3
+        i = key >> 2
+        rotation_fits = fits[r]
+        row_fits = rotation_fits[i]
+        # Slide along the row as far as the free run goes in both
+        # directions: the carry of row_fits + new runs each seed up to the
+        # top of its run, then each run is filled down to the blocked bit
+        # below its lowest seed
+        spread = (row_fits & ~(row_fits + new)) | new
+        lows = spread & ~(spread << 1)
+        while lows:
+            low = lows & -lows
+            lows ^= low
+            spread |= low - (1 << (~row_fits & (low - 1)).bit_length())
+        new = spread & ~reach[key]
+        reach[key] |= new
+        # Only queue poses not reached yet; a kick is still used up by the
+        # poses it takes, reached or not
+        below = new & rotation_fits[i + 1] & ~reach[key + 4] if key + 4 < size else 0
+        if below:
+            if not todo[key + 4]:
+                heappush(heap, key + 4)
+            todo[key + 4] |= below
+        for to, to_fits, offsets in turns[r]:
+            trying = new
+            for kx, ky in offsets:
+                j = i + ky
+                if not trying or j < 0:
+                    break
+                target = j << 2 | to
+                if target >= size:
+                    continue
+                moved = (trying << kx if kx >= 0 else trying >> -kx) & to_fits[j]
+                if moved:
+                    trying &= ~(moved >> kx if kx >= 0 else moved << -kx)
+                    moved &= ~reach[target]
+                    if moved:
+                        if not todo[target]:
+                            heappush(heap, target)
+                        todo[target] |= moved
+
+    # Poses that cannot fall further, without the ones that fill the same
+    # cells as a lower rotation's
+    landed = [[reach[i << 2 | r] & ~rotation_fits[i + 1] for i in range(len(rotation_fits) - 1)]
+              for r, rotation_fits in enumerate(fits)]
+    for r2, r1, dx, dy in DUPLICATES[piece.type]:
+        same = landed[r1]
+        for i, bits in enumerate(landed[r2]):
+            if bits and 0 <= i + dy < len(same):
+                other = same[i + dy]
+                landed[r2][i] = bits & ~(other >> dx if dx >= 0 else other << -dx)
+    placements = []
+    for r in range(num_states):
+        for i, bits in enumerate(landed[r]):
+            y = i + TOP
+            while bits:
+                low = bits & -bits
+                bits ^= low
+                placements.append(Placement(low.bit_length() - 1 - PAD, y, r, None))
+    return placements
@@ -0,0 +1,216 @@
+import pygame
+from config import Config
+from hud import Hud
+from sprites import SpriteAtlas, SLOT_MARGIN
+
+BACKGROUND_COLOR = (200, 200, 200)  # Light gray background color
+LOCKED_COLOR = (200, 55, 169)
+BORDER_COLOR = (0, 0, 0)
+GHOST_COLOR = (169, 169, 169)
+TEXT_COLOR = (0, 0, 0)
+HUD_LABELS = ["Score: ", "Lines Cleared: ", "Level: ", "ARR: ", "DAS: ", "Gravity: ", "LockTime: ", "Coords: ", "Width: "]
+
+
+class Renderer:
+    # Retained-mode renderer: remembers what it drew last frame and only
+    # repaints the cells, held piece, preview and HUD that changed, then
+    # pushes just those rects to the display. A shop change repaints the
+    # whole screen.
+    def __init__(self, screen, offset_x, offset_y):
+        self.screen = screen
+        self.cell_size = Config.CELL_SIZE
+        self.board_width = Config.BOARD_WIDTH
+        self.board_pixel_width = self.board_width * self.cell_size
+        self.board_pixel_height = 20 * self.cell_size  # Visible rows, hidden rows excluded
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+        self.background = pygame.Surface(screen.get_size())
+        self.background.fill(BACKGROUND_COLOR)
+        self.atlas = SpriteAtlas(self.cell_size, (LOCKED_COLOR, BORDER_COLOR, GHOST_COLOR))
+        self.hud = Hud(screen, self.background, HUD_LABELS,
+                       (self.cell_size, 2 * self.cell_size + offset_y), 40, TEXT_COLOR)
+
+        self.drawn_rows = None  # Copies of the grid rows as last drawn
+        self.drawn_overlay = {}  # (x, y) -> color of ghost and current piece cells
+        self.drawn_shop = None
+        self.drawn_held = None
+        self.drawn_preview = None
+        self.preview_rect = None
+
+    def cell_rect(self, x, y):
+        return pygame.Rect(self.offset_x + x * self.cell_size,
+                           self.offset_y + (y - 2) * self.cell_size,
+                           self.cell_size, self.cell_size)
+
+    def board_color(self, state, x, y):
+        if y < 0:
+            return None  # Pieces can poke above the grid into the hidden rows
+        cell = state.board.grid[y][x]
+        if cell == 2 and (state.shop_phase or x < self.board_width):
+            return LOCKED_COLOR
+        if cell == 1 and state.shop_phase and x < self.board_width:
+            return BORDER_COLOR
+        return None
+
+    def overlay_cells(self, state):
+        overlay = {}
+        current_piece = state.current_piece
+        ghost_y = current_piece.y + state.board.drop_distance(current_piece)
+        for x, y in current_piece.cells:
+            if ghost_y + y >= 2:  # Ghost stays out of the hidden rows
+                overlay[current_piece.x + x, ghost_y + y] = GHOST_COLOR
+        for x, y in current_piece.cells:
+            overlay[current_piece.x + x, current_piece.y + y] = current_piece.color
+        return overlay
+
+    def shop_key(self, state):
+        if not state.shop_phase:
+            return None
+        return state.shop.version
+
+    def draw(self, state):
+        shop_key = self.shop_key(state)
+        if self.drawn_rows is None or shop_key != self.drawn_shop:
+            self.draw_all(state, shop_key)
+            pygame.display.update()
+            return
+
+        grid = state.board.grid
+        dirty_cells = set()
+        for y, row in enumerate(grid):
+            drawn = self.drawn_rows[y]
+            if row != drawn:
+                for x, cell in enumerate(row):
+                    if cell != drawn[x]:
+                        dirty_cells.add((x, y))
+                self.drawn_rows[y] = list(row)
+
+        overlay = self.overlay_cells(state)
+        drawn_overlay = self.drawn_overlay
+        for position, color in overlay.items():
+            if drawn_overlay.get(position) != color:
+                dirty_cells.add(position)
+        for position in drawn_overlay:
+            if position not in overlay:
+                dirty_cells.add(position)
+        self.drawn_overlay = overlay
+
+        blits = [self.cell_blit(state, overlay, x, y) for x, y in dirty_cells]
+        rects = [blit[1] for blit in blits]
+        if blits:
+            self.screen.blits(blits, doreturn=False)
+            self.draw_outlines(state)
+
+        rects.extend(self.draw_held_piece(state))
+        rects.extend(self.draw_preview(state))
+        rects.extend(self.draw_info(state))
+        if rects:
+            pygame.display.update(rects)
+
+    def draw_all(self, state, shop_key):
+        self.screen.blit(self.background, (0, 0))
+        grid = state.board.grid
+        self.drawn_rows = [list(row) for row in grid]
+        self.drawn_overlay = self.overlay_cells(state)
+        self.drawn_shop = shop_key
+        blits = [self.cell_blit(state, self.drawn_overlay, x, y)
+                 for y in range(len(grid)) for x in range(len(grid[y]))]
+        blits.extend(self.cell_blit(state, self.drawn_overlay, x, y)
+                     for x, y in self.drawn_overlay if y < 0)
+        self.screen.blits(blits, doreturn=False)
+        self.draw_outlines(state)
+        self.drawn_held = None
+        self.drawn_preview = None
+        self.hud.invalidate()
+        self.draw_held_piece(state)
+        self.draw_preview(state)
+        self.draw_info(state)
+
+    def cell_blit(self, state, overlay, x, y):
+        # (source, dest[, area]) for Surface.blits; dest is the cell's rect
+        rect = self.cell_rect(x, y)
+        # Locked cells win over the piece overlay, as they always have
+        color = self.board_color(state, x, y) or overlay.get((x, y))
+        if color is None:
+            return (self.background, rect, rect)
+        return (self.atlas.cell(color), rect)
+
+    def draw_outlines(self, state):
+        # Well border and shop outlines sit on top of the cells
+        pygame.draw.line(self.screen, BORDER_COLOR,
+                        (self.offset_x, self.offset_y + self.board_pixel_height + 2*self.cell_size),
+                        (self.offset_x + self.board_pixel_width, self.offset_y + self.board_pixel_height + 2*self.cell_size), 4)
+        pygame.draw.line(self.screen, BORDER_COLOR,
+                        (self.offset_x, self.offset_y + 2*self.cell_size),
+                        (self.offset_x, self.offset_y + self.board_pixel_height + 2*self.cell_size), 4)
+        pygame.draw.line(self.screen, BORDER_COLOR,
+                        (self.offset_x + self.board_pixel_width, self.offset_y + 2*self.cell_size),
+                        (self.offset_x + self.board_pixel_width, self.offset_y + self.board_pixel_height + 2*self.cell_size), 4)
+        if state.shop_phase:
+            self.draw_shop(state.shop)
+
+    def draw_held_piece(self, state):
+        held_piece = state.held_piece
+        held = None if held_piece is None else (held_piece.type, held_piece.current_state)
+        if held == self.drawn_held:
+            return []
+        self.drawn_held = held
+        rect = pygame.Rect(10, 10, 4 * self.cell_size, 4 * self.cell_size)
+        self.screen.blit(self.background, rect, rect)
+        if held_piece:
+            cell = self.atlas.cell(held_piece.color)
+            self.screen.blits([(cell, (10 + x * self.cell_size, 10 + y * self.cell_size))
+                               for x, y in held_piece.cells], doreturn=False)
+        return [rect]
+
+    def preview_panel(self, count):
+        # Upcoming pieces in a row centred under the well, clear of the
+        # hidden rows and the shop, one four-cell box each; spawn
+        # rotations are at most two cells tall
+        step = 5 * self.cell_size
+        width = step * count - self.cell_size
+        left = max(10, self.offset_x + (self.board_pixel_width - width) // 2)
+        top = self.offset_y + self.board_pixel_height + 3 * self.cell_size
+        return pygame.Rect(left, top, width, 2 * self.cell_size)
+
+    def draw_preview(self, state):
+        preview = state.preview()
+        if preview == self.drawn_preview:
+            return []
+        self.drawn_preview = preview
+        rects = []
+        rect = self.preview_panel(state.preview_count)
+        if rect != self.preview_rect:
+            if self.preview_rect is not None:  # Count changed: clear the old panel
+                self.screen.blit(self.background, self.preview_rect, self.preview_rect)
+                rects.append(self.preview_rect)
+            self.preview_rect = rect
+        self.screen.blit(self.background, rect, rect)
+        step = 5 * self.cell_size
+        self.screen.blits([(self.atlas.piece(piece_type), (rect.left + i * step, rect.top))
+                           for i, piece_type in enumerate(preview)], doreturn=False)
+        rects.append(rect)
+        return rects
+
+    def draw_info(self, state):
+        return self.hud.draw([
+            state.score_manager.get_score(),
+            state.score_manager.get_lines_cleared(),
+            state.level_manager.get_level(),
+            state.ARR,
+            state.DAS,
+            state.score_manager.get_gravity(),
+            state.lock_time_remaining(),
+            (state.current_piece.x, state.current_piece.y),
+            self.board_width,
+        ])
+
+    def draw_shop(self, shop):
+        blits = []
+        for i in range(3):  # Number of shop items available
+            if shop.shop_items[i] != 0:
+                xpos = self.offset_x + (shop.shop_x[i] + 1) * self.cell_size
+                ypos = self.offset_y + (shop.shop_y[i] - 2) * self.cell_size
+                blits.append((self.atlas.slot_outline(shop.shop_slots[i]), (xpos - SLOT_MARGIN, ypos - SLOT_MARGIN)))
+        self.screen.blits(blits, doreturn=False)
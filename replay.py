@@ -0,0 +1,201 @@
+import hashlib
+import sys
+import time
+
+from engine import GameState, Inputs, HELD_ACTIONS, PRESSED_ACTIONS
+
+# File layout, every integer a LEB128 varint:
+#   MAGIC, version, seed (see encode_seed), tick rate
+#   records: (tick delta << 1), held bitmask, press count, press codes...
+#   end:     (tick delta << 1 | 1), score, lines cleared, 8 byte board hash
+# A record is only written on ticks where the held keys change or a key is
+# pressed, so idle stretches cost nothing.
+MAGIC = b'TRRP'
+VERSION = 4  # 2: pieces come from the 7-bag queue, 3: signed and text seeds, 4: a stream per bag and shop opening
+HELD_BITS = {action: 1 << i for i, action in enumerate(HELD_ACTIONS)}
+PRESS_CODES = {action: i for i, action in enumerate(PRESSED_ACTIONS)}
+CHUNK_SIZE = 1 << 16
+
+
+def encode_varint(value, out):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, pos):
+    # (value, position after it); IndexError if data ends inside it
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def zigzag(value):
+    # Signed to unsigned: 0, -1, 1, -2, ... become 0, 1, 2, 3, ...
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def encode_seed(seed, out):
+    # An int seed as zigzag << 1; anything else GameRng accepts as its
+    # str() in UTF-8, length << 1 | 1 first. GameRng only ever uses
+    # str(seed), so the text plays the same game.
+    if isinstance(seed, int):
+        encode_varint(zigzag(seed) << 1, out)
+    else:
+        text = str(seed).encode()
+        encode_varint(len(text) << 1 | 1, out)
+        out += text
+
+
+def decode_seed(header, read_bytes):
+    # The seed encode_seed wrote, given its first varint and a function
+    # that reads the next count bytes
+    if header & 1:
+        return bytes(read_bytes(header >> 1)).decode()
+    return unzigzag(header >> 1)
+
+
+def board_hash(board):
+    return hashlib.blake2b(b''.join(bytes(row) for row in board.grid), digest_size=8).digest()
+
+
+class ReplayWriter:
+    def __init__(self, file, seed, tick_rate):
+        self.file = file
+        self.buffer = bytearray(MAGIC)
+        encode_varint(VERSION, self.buffer)
+        encode_seed(seed, self.buffer)
+        encode_varint(int(tick_rate), self.buffer)
+        self.last_tick = 0
+        self.last_held = 0
+
+    def record(self, tick, inputs):
+        held = 0
+        for action in inputs.held:
+            held |= HELD_BITS[action]
+        if held == self.last_held and not inputs.pressed:
+            return
+        buffer = self.buffer
+        encode_varint((tick - self.last_tick) << 1, buffer)
+        encode_varint(held, buffer)
+        encode_varint(len(inputs.pressed), buffer)
+        for action in inputs.pressed:
+            encode_varint(PRESS_CODES[action], buffer)
+        self.last_tick = tick
+        self.last_held = held
+        if len(buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    def finish(self, state):
+        encode_varint((state.ticks - self.last_tick) << 1 | 1, self.buffer)
+        encode_varint(state.score, self.buffer)
+        encode_varint(state.lines_cleared, self.buffer)
+        self.buffer += board_hash(state.board)
+        self.flush()
+        self.file.close()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer = bytearray()
+
+
+class ReplayReader:
+    # Decodes a replay a chunk at a time, so memory use does not grow with
+    # the length of the session
+    def __init__(self, file):
+        self.file = file
+        self.buffer = b''
+        self.pos = 0
+        if self.read_bytes(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a replay file")
+        version = self.read_varint()
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+        self.seed = decode_seed(self.read_varint(), self.read_bytes)
+        self.tick_rate = self.read_varint()
+        self.end = None  # (tick, score, lines cleared, board hash) once read
+
+    def refill(self):
+        chunk = self.file.read(CHUNK_SIZE)
+        if not chunk:
+            raise EOFError("Replay ended without an end record")
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def read_varint(self):
+        while True:
+            try:
+                value, self.pos = decode_varint(self.buffer, self.pos)
+                return value
+            except IndexError:
+                self.refill()  # The varint runs past the end of the chunk
+
+    def read_bytes(self, count):
+        while len(self.buffer) - self.pos < count:
+            self.refill()
+        data = self.buffer[self.pos:self.pos + count]
+        self.pos += count
+        return data
+
+    def __iter__(self):
+        # Yields (tick, held actions, pressed actions) for every record
+        tick = 0
+        while True:
+            header = self.read_varint()
+            tick += header >> 1
+            if header & 1:
+                score = self.read_varint()
+                lines = self.read_varint()
+                self.end = (tick, score, lines, self.read_bytes(8))
+                return
+            held_bits = self.read_varint()
+            held = [action for action, bit in HELD_BITS.items() if held_bits & bit]
+            pressed = [PRESSED_ACTIONS[self.read_varint()] for _ in range(self.read_varint())]
+            yield tick, held, pressed
+
+
+def run_replay(file):
+    # Re-run a replay as fast as the engine goes and check it ends in the
+    # recorded state. Returns the final GameState and the number of ticks.
+    reader = ReplayReader(file)
+    state = GameState(reader.seed, reader.tick_rate)
+    held = []
+    for tick, next_held, pressed in reader:
+        idle = Inputs(held)
+        while state.ticks < tick - 1 and state.running:
+            state.tick(idle)
+        held = next_held
+        state.tick(Inputs(held, pressed))
+    end_tick, score, lines, digest = reader.end
+    idle = Inputs(held)
+    while state.ticks < end_tick and state.running:
+        state.tick(idle)
+    if (state.ticks, state.score, state.lines_cleared, board_hash(state.board)) != reader.end:
+        raise AssertionError(f"Replay diverged at tick {state.ticks}: score {state.score} "
+                             f"(expected {score}), lines {state.lines_cleared} (expected {lines})")
+    return state, state.ticks
+
+
+def main():
+    for path in sys.argv[1:]:
+        start = time.perf_counter()
+        with open(path, 'rb') as file:
+            state, ticks = run_replay(file)
+        elapsed = time.perf_counter() - start
+        print(f"{path}: ok, {ticks:,} ticks, score {state.score}, "
+              f"{ticks / elapsed:,.0f} ticks/sec ({ticks / state.tick_rate / elapsed:,.0f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import random
+from pieces import PIECE_TYPES
+
+
+class GameRng:
+    # One per game. Every consumer draws from its own stream derived from the
+    # game seed, so e.g. how often the shop opens never shifts the pieces.
+    # Each bag and each shop opening gets a fresh stream of its own, so the
+    # whole state is the seed and two counts.
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self.bags = 0  # Bags dealt so far
+        self.shops = 0  # Shop openings so far
+
+    def stream(self, name):
+        # String seeds are hashed by random.Random, so the same (seed, name)
+        # gives the same sequence on every platform and Python version
+        return random.Random(f'{self.seed}:{name}')
+
+    def next_bags(self, count):
+        # The next count shuffled 7-bags as one flat list of piece types
+        pieces = []
+        for _ in range(count):
+            bag = list(PIECE_TYPES)
+            self.stream(f'bag:{self.bags}').shuffle(bag)
+            self.bags += 1
+            pieces.extend(bag)
+        return pieces
+
+    def next_shop(self):
+        # The stream for the next shop opening
+        self.shops += 1
+        return self.stream(f'shop:{self.shops - 1}')
+
+    def copy(self):
+        # Counts that continue exactly where this game's would
+        rng = GameRng(self.seed)
+        rng.bags = self.bags
+        rng.shops = self.shops
+        return rng
+
+    def getstate(self):
+        return self.seed, self.bags, self.shops
+
+    def setstate(self, state):
+        self.seed, self.bags, self.shops = state
@@ -0,0 +1,63 @@
+from collections import namedtuple
+
+from bitboard import PAD
+from pieces import ROTATION_TABLE
+import wallkicks
+
+# Turns, as the number of clockwise quarter turns
+CW = 1
+HALF = 2
+CCW = 3
+TURNS = (CW, HALF, CCW)
+
+# Every rotation of every piece compiled once at import, so trying a turn is
+# a table read and a few mask tests.
+#   to:        rotation after the turn
+#   kicks:     (dx, dy) offsets to try, in order
+#   row_masks: the target rotation's (row offset, bitmask) pairs, as in
+#              PieceGeometry.row_masks
+# ROTATIONS[piece type][from rotation][turn]; index 0 is unused.
+Rotation = namedtuple('Rotation', ['to', 'kicks', 'row_masks'])
+
+
+def _build(piece_type):
+    geometry = ROTATION_TABLE[piece_type]
+    num_states = len(geometry.states)
+    table = []
+    for r in range(num_states):
+        turns = [None] * 4
+        for turn in TURNS:
+            to = (r + turn) % num_states
+            turns[turn] = Rotation(to, tuple(wallkicks.get_wall_kicks(piece_type, r, to)), geometry.row_masks[to])
+        table.append(tuple(turns))
+    return tuple(table)
+
+
+ROTATIONS = {piece_type: _build(piece_type) for piece_type in ROTATION_TABLE}
+
+
+def resolve(board, piece, turn, shop_phase):
+    # The first kick that lets piece make the turn on a BitBoard, as
+    # (rotation, dx, dy, kick index), or None if every kick is blocked. The
+    # piece itself is not touched. Same test as BitBoard.fits, inlined.
+    rotation = ROTATIONS[piece.type][piece.current_state][turn]
+    walls = board.walls[shop_phase]
+    grid = board.grid
+    height = board.height
+    x = piece.x + PAD
+    y = piece.y
+    for index, (dx, dy) in enumerate(rotation.kicks):
+        shift = x + dx
+        if shift < 0:
+            continue
+        top = y + dy
+        for row, mask in rotation.row_masks:
+            row += top
+            if row >= height:
+                break
+            mask <<= shift
+            if (grid[row].mask | walls if row >= 0 else walls) & mask:
+                break
+        else:
+            return rotation.to, dx, dy, index
+    return None
@@ -1,11 +1,44 @@
 import math
+from events import LinesCleared, SpinDetected
+from spin_manager import SPIN, MINI
+
+LINE_CLEAR_SCORES = {1: 100, 2: 200, 3: 400, 4: 800}
+# Bonus on top of the line score for a spin, by lines cleared; spins by
+# pieces other than T score as minis
+SPIN_BONUS = {
+    SPIN: {0: 400, 1: 700, 2: 1000, 3: 1200},
+    MINI: {0: 100, 1: 100, 2: 200},
+}
+GRAVITY_DECAY = .007**(1/29)  # At level 29 gravity reaches 1 ms
 
 class ScoreManager:
-    def __init__(self, level_manager):
+    def __init__(self, level_manager, line_scores=LINE_CLEAR_SCORES, gravity_decay=GRAVITY_DECAY, events=None,
+                 spin_bonus=SPIN_BONUS):
+        self.line_scores = line_scores
+        self.spin_bonus = spin_bonus
+        self.gravity_decay = gravity_decay
         self.lines_cleared = 0
         self.score = 0
         self.gravity = 500  # Gravity at level 0
         self.level_manager = level_manager
+        if events is not None:
+            events.subscribe(LinesCleared, self.on_lines_cleared)
+            events.subscribe(SpinDetected, self.on_spin_detected)
+
+    def on_lines_cleared(self, event):
+        self.add_lines_cleared(event.count)
+
+    def on_spin_detected(self, event):
+        spin = event.spin if event.piece_type == 'T' else MINI
+        self.score += self.spin_bonus[spin].get(event.lines, 0)
+
+    def copy(self, level_manager, events=None):
+        # The score tables are shared, not copied
+        score_manager = ScoreManager(level_manager, self.line_scores, self.gravity_decay, events, self.spin_bonus)
+        score_manager.lines_cleared = self.lines_cleared
+        score_manager.score = self.score
+        score_manager.gravity = self.gravity
+        return score_manager
 
     def add_lines_cleared(self, lines):
         previous_lines_cleared = self.lines_cleared
@@ -18,17 +51,10 @@ class ScoreManager:
             self.adjust_gravity()
 
     def add_score(self, lines_cleared):
-        if lines_cleared == 1:
-            self.score += 100
-        elif lines_cleared == 2:
-            self.score += 200
-        elif lines_cleared == 3:
-            self.score += 400
-        elif lines_cleared == 4:
-            self.score += 800
+        self.score += self.line_scores.get(lines_cleared, 0)
 
     def adjust_gravity(self):
-        self.gravity = math.floor(self.gravity*.007**(1/29)) # At level 29 this = 1 ms
+        self.gravity = math.floor(self.gravity*self.gravity_decay)
 
     def get_gravity(self):
         return self.gravity
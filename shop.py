@@ -0,0 +1,184 @@
+from collections import namedtuple
+
+from bitboard import PAD
+from events import PieceLocked, Purchase
+from rng import GameRng
+
+# Slot types: 1 I, 2 O, 3 T, 4 J or L, 5 Z, 6 S, 7 L, 8 J
+# Open-topped outline drawn around each slot, as a polyline in cell units
+# relative to the slot's top-left inner cell
+SLOT_OUTLINES = {
+    1: [(0, 0), (0, 4), (1, 4), (1, 0)],
+    2: [(0, 0), (0, 2), (2, 2), (2, 0)],
+    3: [(0, 0), (0, 1), (1, 1), (1, 2), (2, 2), (2, 1), (3, 1), (3, 0)],
+    4: [(0, 0), (0, 4), (2, 4), (2, 0)],
+    5: [(0, 1), (0, 3), (1, 3), (1, 2), (2, 2), (2, 0)],
+    6: [(0, 0), (0, 2), (1, 2), (1, 3), (2, 3), (2, 1)],
+    7: [(0, 0), (0, 1), (1, 1), (1, 3), (2, 3), (2, 0)],
+    8: [(0, 0), (0, 3), (1, 3), (1, 1), (2, 1), (2, 0)],
+}
+# Cells a piece has to fill to buy each slot, as (dx, dy) from the slot's
+# left border and top row
+SLOT_CELLS = {
+    1: [(1, 0), (1, 1), (1, 2), (1, 3)],
+    2: [(1, 0), (2, 0), (1, 1), (2, 1)],
+    3: [(1, 0), (2, 0), (3, 0), (2, 1)],
+    4: [(1, 0), (2, 0), (1, 1), (2, 1), (1, 2), (2, 2), (1, 3), (2, 3)],
+    5: [(1, 1), (1, 2), (2, 1), (2, 0)],
+    6: [(1, 0), (1, 1), (2, 1), (2, 2)],
+    7: [(1, 0), (2, 0), (2, 1), (2, 2)],
+    8: [(1, 0), (2, 0), (1, 1), (1, 2)],
+}
+# Solid border cells that hold a piece in place over the slot, same offsets
+SLOT_BORDERS = {
+    1: [(0, 0), (0, 1), (0, 2), (0, 3), (1, 4), (2, 3), (2, 2), (2, 1), (2, 0)],
+    2: [(0, 0), (0, 1), (1, 2), (2, 2), (3, 1), (3, 0)],
+    3: [(0, 0), (1, 1), (2, 2), (3, 1), (4, 0)],
+    4: [(0, 0), (0, 1), (0, 2), (0, 3), (1, 4), (2, 4), (3, 3), (3, 2), (3, 1), (3, 0)],
+    5: [(0, 1), (0, 2), (1, 3), (2, 2), (3, 1), (3, 0)],
+    6: [(0, 0), (0, 1), (1, 2), (2, 3), (3, 2), (3, 1)],
+    7: [(0, 0), (1, 1), (1, 2), (2, 3), (3, 2), (3, 1), (3, 0)],
+    8: [(0, 0), (0, 1), (0, 2), (1, 3), (2, 2), (2, 1), (3, 0)],
+}
+SHOP_SLOT_TYPES = (1, 2, 3, 4, 5, 6, 7, 8)
+
+# Every slot type compiled once at import. The masks are (row offset,
+# bitmask) pairs like PieceGeometry.row_masks, with bit 0 at the slot's left
+# border; shift them by the slot's column + PAD to line up with BitBoard rows.
+#   width:        columns between the left and right border
+#   cell_masks:   the cells to fill
+#   border_masks: the border cells
+#   size:         number of cells to fill
+SlotGeometry = namedtuple('SlotGeometry', ['width', 'cell_masks', 'border_masks', 'size'])
+
+
+def _row_masks(offsets):
+    masks = {}
+    for dx, dy in offsets:
+        masks[dy] = masks.get(dy, 0) | 1 << dx
+    return tuple(sorted(masks.items()))
+
+
+def _build(slot_type):
+    cells = SLOT_CELLS[slot_type]
+    return SlotGeometry(max(dx for dx, _ in cells), _row_masks(cells),
+                        _row_masks(SLOT_BORDERS[slot_type]), len(cells))
+
+
+SLOT_TABLE = {slot_type: _build(slot_type) for slot_type in SLOT_CELLS}
+
+
+class Shop:
+    # Slots are read and written through BitBoard row masks, so board must
+    # be a BitBoard. With an event bus the shop checks its slots on every
+    # PieceLocked while open and publishes a Purchase for each slot bought.
+    def __init__(self, rng=None, slots=SHOP_SLOT_TYPES, events=None):
+        self.rng = rng or GameRng()  # The game's GameRng; each opening draws from next_shop()
+        self.shop_slots = list(slots)  # Slot types on offer; the first three after a shuffle are shown
+        self.shop_items = [0, 0, 0]
+        self.shop_x = [0, 0, 0]  # Grid column of each slot's left border
+        self.shop_y = [0, 0, 0]  # Grid row of each slot's top cell
+        self.purchases = []
+        self.slot_rows = [{}, {}, {}]  # Grid row -> row bits of each slot's cells
+        self.version = 0  # Bumped whenever the slots on display change
+        self.is_open = False
+        self.events = events
+        if events is not None:
+            events.subscribe(PieceLocked, self.on_piece_locked)
+
+    def open(self, board):
+        rng = self.rng.next_shop()
+        rng.shuffle(self.shop_slots)
+        self.shop_items = []
+        self.shop_y = []
+        for _ in range(3):  # Number of shop items available
+            y_cell = rng.randint(4, 17) + 2
+            self.shop_y.append(y_cell)
+            self.shop_items.append(y_cell)
+
+        # Slots sit side by side right of the main board, two columns apart
+        self.shop_x = []
+        slot = board.width + 1
+        for i in range(3):
+            self.shop_x.append(slot)
+            slot += SLOT_TABLE[self.shop_slots[i]].width + 2
+
+        for index in range(3):
+            self.mark_slot(board, index)
+        self.index_slots()
+        self.is_open = True
+        board.changed()
+
+    def copy(self, rng, events=None):
+        # rng is the copy's GameRng. slot_rows is shared: it is only
+        # ever replaced, never changed in place.
+        shop = Shop(rng, self.shop_slots, events)
+        shop.shop_items = list(self.shop_items)
+        shop.shop_x = list(self.shop_x)
+        shop.shop_y = list(self.shop_y)
+        shop.purchases = list(self.purchases)
+        shop.slot_rows = self.slot_rows
+        shop.version = self.version
+        shop.is_open = self.is_open
+        return shop
+
+    def index_slots(self):
+        # Rebuild slot_rows after the slots on display change
+        self.slot_rows = [dict(self.slot_masks(index, SLOT_TABLE[self.shop_slots[index]].cell_masks))
+                          for index in range(3)]
+        self.version += 1
+
+    def close(self, board):
+        board.clear_shop_area()
+        self.version += 1
+        self.is_open = False
+
+    def on_piece_locked(self, event):
+        if self.is_open:
+            self.check_purchases(event.board, event.written)
+
+    def check_purchases(self, board, written=None):
+        # Buys every slot on sale that is filled. written, the (row, row
+        # bits) pairs a lock just set, limits the check to slots under those
+        # cells: nothing else can have changed since the last check.
+        purchased = []
+        for index in range(3):
+            if self.shop_items[index] == 0:
+                continue
+            if written is not None:
+                slot_rows = self.slot_rows[index]
+                if not any(slot_rows.get(y, 0) & bits for y, bits in written):
+                    continue
+            if self.is_slot_filled(board, index):
+                self.attempt_to_purchase(board, index)
+                purchased.append(self.shop_slots[index])
+                if self.events is not None:
+                    self.events.emit(Purchase, self.shop_slots[index], index)
+        self.purchases.extend(purchased)
+        return purchased
+
+    def slot_masks(self, index, masks):
+        # (grid row, BitBoard row bits) for one of a slot's compiled masks
+        shift = self.shop_x[index] + PAD
+        y = self.shop_y[index]
+        return [(y + dy, mask << shift) for dy, mask in masks]
+
+    def mark_slot(self, board, index):
+        slot = SLOT_TABLE[self.shop_slots[index]]
+        board.write_masks(self.slot_masks(index, slot.border_masks), 1)
+
+    def is_slot_filled(self, board, index):
+        # Nothing but a locked piece can occupy a slot's cells, so full
+        # occupancy under the cell masks means the slot is filled
+        grid = board.grid
+        for y, bits in self.slot_rows[index].items():
+            if grid[y].mask & bits != bits:
+                return False
+        return True
+
+    def attempt_to_purchase(self, board, index):
+        slot = SLOT_TABLE[self.shop_slots[index]]
+        board.write_masks(self.slot_masks(index, slot.cell_masks + slot.border_masks), 0)
+        self.shop_items[index] = 0
+        self.version += 1
+        board.changed()
@@ -0,0 +1,234 @@
+import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import GameState
+from events import LevelUp
+from pieces import PIECE_CLASSES, PIECE_TYPES
+from replay import encode_varint, decode_varint, encode_seed, decode_seed, zigzag, unzigzag
+
+# A whole run in a few hundred bytes. Integers are LEB128 varints, signed
+# ones zigzag encoded:
+#   MAGIC, version, seed (see replay.encode_seed), tick rate, ticks,
+#         flags (FLAG_* bits)
+#   score, lines cleared and gravity of the ScoreManager, level, game gravity
+#   current piece: type code, rotation, x, y, kick index + 1 (0 for none),
+#         kick turn (0 for none)
+#   held piece and last piece: type code + 1 (0 for none)
+#   bag: length, type codes in spawn order
+#   board: row count, Zobrist hash, then occupied bits and border bits of
+#         every row as little-endian uint32 pairs
+#   wallet: every counter, in the wallet's key order
+#   shop: slot count, slot types, then item, x, y of the three slots on
+#         display, purchase count, purchases
+#   RNG: bags dealt, shop openings (see GameRng)
+# Piece timers and held keys are not kept; they restart from the snapshot
+# tick. Take snapshots between ticks or actions, never from inside an event
+# handler, where a lock is still half done.
+MAGIC = b'TRSN'
+VERSION = 3  # 2: kick turn of the current piece, 3: signed and text seeds, RNG as counts
+FLAG_RUNNING = 1
+FLAG_SHOP_PHASE = 2
+FLAG_CAN_HOLD = 4
+FLAG_SHOP_OPEN = 8
+TYPE_CODES = {piece_type: i for i, piece_type in enumerate(PIECE_TYPES)}
+
+
+def _optional_type(piece_class):
+    return 0 if piece_class is None else TYPE_CODES[piece_class.type] + 1
+
+
+def save(state):
+    out = bytearray(MAGIC)
+    flags = ((FLAG_RUNNING if state.running else 0) | (FLAG_SHOP_PHASE if state.shop_phase else 0)
+             | (FLAG_CAN_HOLD if state.can_hold else 0) | (FLAG_SHOP_OPEN if state.shop.is_open else 0))
+    score_manager = state.score_manager
+    piece = state.current_piece
+    encode_varint(VERSION, out)
+    encode_seed(state.rng.seed, out)
+    values = [int(state.tick_rate), state.ticks, flags,
+              score_manager.score, score_manager.lines_cleared, score_manager.gravity,
+              state.level_manager.level, state.gravity,
+              TYPE_CODES[piece.type], piece.current_state, zigzag(piece.x), zigzag(piece.y),
+              0 if piece.kick_index is None else piece.kick_index + 1, piece.kick_turn or 0,
+              _optional_type(state.held_piece), _optional_type(state.last_piece),
+              len(state.bag)]
+    values.extend(TYPE_CODES[piece_class.type] for piece_class in state.bag)
+    board = state.board
+    values.extend((board.height, board.hash))
+    for value in values:
+        encode_varint(value, out)
+    rows = []
+    for row, border in zip(board.grid, board.border_masks()):
+        rows.append(row.mask)
+        rows.append(border)
+    out += struct.pack(f'<{len(rows)}I', *rows)
+    values = list(state.wallet.wallet.values())
+    shop = state.shop
+    values.append(len(shop.shop_slots))
+    values.extend(shop.shop_slots)
+    for index in range(3):
+        values.extend((shop.shop_items[index], shop.shop_x[index], shop.shop_y[index]))
+    values.append(len(shop.purchases))
+    values.extend(shop.purchases)
+    values.extend((state.rng.bags, state.rng.shops))
+    for value in values:
+        encode_varint(value, out)
+    return bytes(out)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def varint(self):
+        try:
+            value, self.pos = decode_varint(self.data, self.pos)
+        except IndexError:
+            raise ValueError("Snapshot is truncated") from None
+        return value
+
+    def signed(self):
+        return unzigzag(self.varint())
+
+    def varints(self, count):
+        data = self.data
+        pos = self.pos
+        values = []
+        try:
+            for _ in range(count):
+                value, pos = decode_varint(data, pos)
+                values.append(value)
+        except IndexError:
+            raise ValueError("Snapshot is truncated") from None
+        self.pos = pos
+        return values
+
+    def bytes(self, count):
+        data = self.data[self.pos:self.pos + count]
+        if len(data) != count:
+            raise ValueError("Snapshot is truncated")
+        self.pos += count
+        return data
+
+
+def restore(data, rules=None, into=None):
+    # A GameState in the snapshot's state: a new one, or into (a GameState
+    # that is no longer needed) overwritten in place, which skips building
+    # the board and managers. rules are not part of the snapshot; pass the
+    # ones the run was started with.
+    reader = _Reader(data)
+    if reader.bytes(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a snapshot")
+    version = reader.varint()
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    seed = decode_seed(reader.varint(), reader.bytes)
+    tick_rate, ticks, flags = reader.varints(3)
+    if into is None:
+        state = GameState(seed, tick_rate, rules)
+    else:
+        state = into
+        state.rng.seed = seed
+        state.tick_rate = tick_rate
+        state.tick_ms = 1000 / tick_rate
+    state.ticks = ticks
+    state.time_ms = state.last_move_time = state.last_gravity_time = ticks * 1000 / tick_rate
+    state.accumulator = 0
+    state.pending_pressed = []
+    state.lock_delay_start = None
+    state.lock_delay_reset = False
+    state.last_cleared_rows = []
+    for action in state.key_held:
+        state.key_held[action] = False
+        state.key_delay_over[action] = False
+    state.running = bool(flags & FLAG_RUNNING)
+    state.shop_phase = bool(flags & FLAG_SHOP_PHASE)
+    state.can_hold = bool(flags & FLAG_CAN_HOLD)
+
+    score_manager = state.score_manager
+    score_manager.score, score_manager.lines_cleared, score_manager.gravity = reader.varints(3)
+    state.score = score_manager.score
+    state.lines_cleared = score_manager.lines_cleared
+    state.level_manager.level, state.gravity = reader.varints(2)
+
+    piece = PIECE_CLASSES[PIECE_TYPES[reader.varint()]]()
+    piece.current_state = reader.varint()
+    piece.x = reader.signed()
+    piece.y = reader.signed()
+    kick_index, kick_turn = reader.varints(2)
+    piece.kick_index = kick_index - 1 if kick_index else None
+    piece.kick_turn = kick_turn or None
+    state.current_piece = piece
+    held, last = reader.varints(2)
+    state.held_piece = PIECE_CLASSES[PIECE_TYPES[held - 1]]() if held else None
+    state.last_piece = PIECE_CLASSES[PIECE_TYPES[last - 1]] if last else None
+    state.bag = deque(PIECE_CLASSES[PIECE_TYPES[code]] for code in reader.varints(reader.varint()))
+
+    board = state.board
+    height, row_hash = reader.varints(2)
+    if height != board.height:
+        raise ValueError("Snapshot board height does not match Config.BOARD_HEIGHT")
+    rows = struct.unpack(f'<{2 * height}I', reader.bytes(8 * height))
+    board.load_masks(rows[0::2], rows[1::2], row_hash)
+
+    counters = state.wallet.wallet
+    for key, value in zip(list(counters), reader.varints(len(counters))):
+        counters[key] = value
+
+    shop = state.shop
+    shop.shop_slots = reader.varints(reader.varint())
+    slots = reader.varints(9)
+    shop.shop_items = slots[0::3]
+    shop.shop_x = slots[1::3]
+    shop.shop_y = slots[2::3]
+    shop.purchases = reader.varints(reader.varint())
+    shop.is_open = bool(flags & FLAG_SHOP_OPEN)
+    shop.index_slots()
+
+    state.rng.bags, state.rng.shops = reader.varints(2)
+    return state
+
+
+def load(path, rules=None):
+    with open(path, 'rb') as file:
+        return restore(file.read(), rules)
+
+
+def write_atomic(path, data):
+    # Write to a temporary file and rename it over path, so a crash leaves
+    # either the old file or the new one, never half of either
+    with open(path + '.tmp', 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + '.tmp', path)
+
+
+class Autosaver:
+    # Saves the run to path after every level up. A LevelUp arrives in the
+    # middle of a lock, so it only marks a save as due; poll() takes the
+    # snapshot once the lock is done, and a background thread writes it.
+    def __init__(self, state, path):
+        self.state = state
+        self.path = path
+        self.due = False
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix='autosave')
+        state.events.subscribe(LevelUp, self.on_level_up)
+
+    def on_level_up(self, event):
+        self.due = True
+
+    def poll(self):
+        if self.due:
+            self.due = False
+            self.save()
+
+    def save(self):
+        return self.writer.submit(write_atomic, self.path, save(self.state))
+
+    def close(self):
+        self.state.events.unsubscribe(LevelUp, self.on_level_up)
+        self.writer.shutdown(wait=True)
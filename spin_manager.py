@@ -1,20 +1,66 @@
-class SpinDetector:
-    def detect_spin(piece):
-        piece_type = piece.type
-        print(f"Piece type: {piece_type}")
-        print(f"Wall kick data: {piece.currentWallkick}")
-        if piece_type == 'I':  # I piece
-            return "I spin"
-        elif piece_type == 'T':  # T piece
-            return "T spin"
-        elif piece_type == 'J':  # J piece
-            return "J spin"
-        elif piece_type == 'L':  # L piece
-            return "L spin"
-        elif piece_type == 'S':  # S piece
-            return "S spin"
-        elif piece_type == 'Z':  # Z piece
-            return "Z spin"
-        return "No Spin"
+from bitboard import PAD
+from log import logger, DEBUG
+from rotation import CW, CCW
+
+SPIN = 'spin'
+MINI = 'mini'
+TST_KICK = 4  # A T-spin that needed the last quarter-turn kick is never a mini
+
+# Corners of the T piece's 3x3 box as (row offset, bitmask) pairs, like
+# PieceGeometry.row_masks: all four, and per rotation the two on the side
+# the T points to
+T_CORNERS = ((0, 0b101), (2, 0b101))
+T_FRONT_CORNERS = (
+    ((0, 0b101),),
+    ((0, 0b100), (2, 0b100)),
+    ((2, 0b101),),
+    ((0, 0b001), (2, 0b001)),
+)
+
 
-    
\ No newline at end of file
+def occupied_cells(board, masks, x, y, walls):
+    # How many cells under the masks, placed at (x, y), are taken by the
+    # stack or the walls; rows below the floor count as full
+    shift = x + PAD
+    grid = board.grid
+    count = 0
+    for dy, bits in masks:
+        row = y + dy
+        bits <<= shift
+        if row >= board.height:
+            count += bits.bit_count()
+        elif row >= 0:
+            count += ((grid[row].mask | walls) & bits).bit_count()
+        else:
+            count += (walls & bits).bit_count()
+    return count
+
+
+class SpinDetector:
+    # Spins are judged as a piece locks, before it is written to the board.
+    # Only a piece whose last move was a rotation (kick_index is set) can
+    # spin. A T needs three of its four corners taken, and is a mini unless
+    # both front corners are taken or it got there with the TST kick of a
+    # quarter turn. Any other piece spins when it cannot move left, right
+    # or up.
+    @staticmethod
+    def detect_spin(board, piece, shop_phase):
+        if piece.kick_index is None:
+            return None
+        walls = board.walls[shop_phase]
+        if piece.type == 'T':
+            if occupied_cells(board, T_CORNERS, piece.x, piece.y, walls) < 3:
+                return None
+            front = occupied_cells(board, T_FRONT_CORNERS[piece.current_state], piece.x, piece.y, walls)
+            tst = piece.kick_index == TST_KICK and piece.kick_turn in (CW, CCW)
+            spin = SPIN if front == 2 or tst else MINI
+        elif piece.type == 'O':
+            return None
+        elif (board.can_move(piece, -1, 0, shop_phase) or board.can_move(piece, 1, 0, shop_phase)
+              or board.can_move(piece, 0, -1, shop_phase)):
+            return None
+        else:
+            spin = SPIN
+        if logger.enabled(DEBUG):
+            logger.debug('spin', piece=piece.type, spin=spin, kick=piece.kick_index, turn=piece.kick_turn)
+        return spin
@@ -0,0 +1,62 @@
+import pygame
+from pieces import ROTATION_TABLE
+from shop import SLOT_OUTLINES
+
+OUTLINE_COLOR = (0, 0, 0)
+SLOT_LINE_WIDTH = 4
+SLOT_MARGIN = 3  # Room around a slot outline for the thick line to spill into
+
+
+class SpriteAtlas:
+    # Surfaces built once at startup: an outlined cell per color, every piece
+    # in its spawn rotation and the outline of every shop slot type, so a
+    # frame is only blits
+    def __init__(self, cell_size, colors=()):
+        self.cell_size = cell_size
+        self.cells = {}
+        for geometry in ROTATION_TABLE.values():
+            self.cell(geometry.color)
+        for color in colors:
+            self.cell(color)
+        self.pieces = {piece_type: self._build_piece(geometry) for piece_type, geometry in ROTATION_TABLE.items()}
+        self.slot_outlines = {slot_type: self._build_slot_outline(points)
+                              for slot_type, points in SLOT_OUTLINES.items()}
+
+    def cell(self, color):
+        surface = self.cells.get(color)
+        if surface is None:
+            surface = pygame.Surface((self.cell_size, self.cell_size))
+            surface.fill(color)
+            pygame.draw.rect(surface, OUTLINE_COLOR, surface.get_rect(), 1)
+            self.cells[color] = surface
+        return surface
+
+    def piece(self, piece_type):
+        # Spawn rotation, trimmed to its cells
+        return self.pieces[piece_type]
+
+    def slot_outline(self, slot_type):
+        # Blit at the slot's top-left inner cell minus SLOT_MARGIN
+        return self.slot_outlines[slot_type]
+
+    def _build_piece(self, geometry):
+        cells = geometry.cells[0]
+        left = min(x for x, _ in cells)
+        top = min(y for _, y in cells)
+        width = max(x for x, _ in cells) - left + 1
+        height = max(y for _, y in cells) - top + 1
+        surface = pygame.Surface((width * self.cell_size, height * self.cell_size), pygame.SRCALPHA)
+        cell = self.cell(geometry.color)
+        surface.blits([(cell, ((x - left) * self.cell_size, (y - top) * self.cell_size)) for x, y in cells],
+                      doreturn=False)
+        return surface
+
+    def _build_slot_outline(self, points):
+        cell_size = self.cell_size
+        width = max(x for x, _ in points) * cell_size + 2 * SLOT_MARGIN
+        height = max(y for _, y in points) * cell_size + 2 * SLOT_MARGIN
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        pixels = [(SLOT_MARGIN + x * cell_size, SLOT_MARGIN + y * cell_size) for x, y in points]
+        for start, end in zip(pixels, pixels[1:]):
+            pygame.draw.line(surface, OUTLINE_COLOR, start, end, SLOT_LINE_WIDTH)
+        return surface
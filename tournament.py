@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from bot import Bot
+from engine import GameState, Inputs, NO_INPUTS, LEFT, RIGHT, ROTATE_CW, HARD_DROP
+
+# One output column per value recorded for a game, all int64; ticks is how
+# long the game lasted on the simulation clock
+COLUMNS = ('variant', 'seed', 'score', 'lines', 'level', 'purchases', 'pieces', 'ticks')
+# Ticks between a policy's inputs: 20 a second at the default 120 Hz
+ACTION_TICKS = 6
+
+# Rule sets to compare, see GameState for the keys. Each is played on the
+# same seeds, so differences come from the rules and not the piece order.
+VARIANTS = [
+    {},
+    {'gravity_decay': .007**(1/19)},
+    {'line_scores': {1: 100, 2: 300, 3: 500, 4: 800}},
+    {'shop_slots': (1, 2, 3, 4)},
+]
+
+
+# A policy maps (state, rng) to the action path for the current piece. It
+# is sent to the worker processes, so it has to pickle: a module-level
+# function, or a bound method of a picklable object such as a Bot.
+def random_policy(state, rng):
+    # A random rotation and shift; tops out within a few dozen pieces
+    # without clearing lines, so only useful as a baseline
+    reach = 13 if state.shop_phase else 5
+    dx = rng.randint(-5, reach)
+    return [ROTATE_CW] * rng.randrange(4) + [RIGHT if dx > 0 else LEFT] * abs(dx) + [HARD_DROP]
+
+
+_BOT = Bot(depth=1)
+
+
+def bot_policy(state, rng):
+    # The default: a depth-1 bot.Bot, which scores the current piece's
+    # placements alone and so does not look at the preview. Each process
+    # keeps its own, so the transposition table carries over between games.
+    return _BOT.policy(state, rng)
+
+
+POLICIES = {'bot': bot_policy, 'random': random_policy}
+
+
+def play_game(seed, rules=None, policy=bot_policy, max_pieces=500, action_ticks=ACTION_TICKS):
+    # Plays one game on the simulation clock: the policy plans a path when a
+    # piece spawns, and its actions are pressed one every action_ticks
+    # ticks while gravity and lock delay run as usual. A piece that falls
+    # or locks before its path is done plays out the rest as it can, so
+    # faster gravity costs placements.
+    state = GameState(seed, rules=rules)
+    rng = state.rng.stream('policy')
+    pieces = 0
+    while state.running and pieces < max_pieces:
+        piece = state.current_piece
+        for action in policy(state, rng):
+            if state.current_piece is not piece or not state.running:
+                break
+            state.tick(Inputs((), (action,)))
+            for _ in range(action_ticks - 1):
+                if state.current_piece is not piece or not state.running:
+                    break
+                state.tick(NO_INPUTS)
+        pieces += 1
+    return state, pieces
+
+
+def _warm_up():
+    # Runs once in every worker: get the piece tables, bitboard and kick
+    # lookups imported and exercised before real work arrives
+    play_game(0, max_pieces=50)
+
+
+def run_chunk(variant, rules, seeds, max_pieces, policy=bot_policy):
+    columns = [array('q') for _ in COLUMNS]
+    for seed in seeds:
+        state, pieces = play_game(seed, rules, policy, max_pieces)
+        row = (variant, seed, state.score, state.lines_cleared, state.level_manager.get_level(),
+               len(state.shop.purchases), pieces, state.ticks)
+        for column, value in zip(columns, row):
+            column.append(value)
+    return columns
+
+
+def run_tournament(variants, seeds, path, workers=None, chunk_size=None, max_pieces=500, policy=bot_policy):
+    # Plays every variant on every seed across a process pool into an .npy
+    # file holding one record per game, an int64 field per column, in
+    # variant then seed order. The file is sized up front and each chunk is
+    # written to its rows and flushed as soon as it finishes, so results
+    # never wait on the slowest worker or pile up in memory.
+    workers = workers or os.cpu_count()
+    if chunk_size is None:
+        chunk_size = max(1, len(seeds) * len(variants) // (workers * 8))
+    dtype = np.dtype([(name, np.int64) for name in COLUMNS])
+    results = np.lib.format.open_memmap(path + '.tmp', mode='w+', dtype=dtype,
+                                        shape=(len(variants) * len(seeds),))
+    with ProcessPoolExecutor(workers, initializer=_warm_up) as pool:
+        futures = {pool.submit(run_chunk, variant, rules, seeds[i:i + chunk_size], max_pieces, policy):
+                   variant * len(seeds) + i
+                   for variant, rules in enumerate(variants)
+                   for i in range(0, len(seeds), chunk_size)}
+        for future in as_completed(futures):
+            start = futures[future]
+            for name, values in zip(COLUMNS, future.result()):
+                results[name][start:start + len(values)] = np.frombuffer(values, dtype=np.int64)
+            results.flush()
+    del results
+    os.replace(path + '.tmp', path)
+    return np.load(path)
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    path = sys.argv[3] if len(sys.argv) > 3 else 'tournament.npy'
+    policy = POLICIES[sys.argv[4] if len(sys.argv) > 4 else 'bot']
+    start = time.perf_counter()
+    results = run_tournament(VARIANTS, list(range(games)), path, workers, policy=policy)
+    elapsed = time.perf_counter() - start
+    print(f"{games * len(VARIANTS):,} games in {elapsed:.1f}s ({games * len(VARIANTS) / elapsed:,.0f} games/sec) -> {path}")
+    for variant, rules in enumerate(VARIANTS):
+        rows = results['variant'] == variant
+        print(f"{variant}: score {results['score'][rows].mean():8.1f}  lines {results['lines'][rows].mean():6.2f}  "
+              f"level {results['level'][rows].mean():5.2f}  purchases {results['purchases'][rows].mean():5.2f}  "
+              f"ticks {results['ticks'][rows].mean():8.0f}  {rules}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,14 @@
+from events import LinesCleared, SpinDetected
+from spin_manager import SPIN
+
+# Currency credited for a spin that clears lines, by piece type; T-spins
+# only pay out for full (not mini) doubles and triples
+SPIN_CURRENCY = {'L': "lspins", 'J': "jspins", 'S': "sspins", 'Z': "zspins", 'I': "ispins"}
+TSPIN_CURRENCY = {2: "tspin_doubles", 3: "tspin_triples"}
+
+
 class wallet:
-    def __init__(self):
+    def __init__(self, events=None):
         self.wallet = {
             "tspin_doubles": 0,
             "tspin_triples": 0,
@@ -11,6 +20,29 @@ class wallet:
             "tetrises": 0,
             "all_clears": 0
         }
+        if events is not None:
+            events.subscribe(LinesCleared, self.on_lines_cleared)
+            events.subscribe(SpinDetected, self.on_spin_detected)
+
+    def on_lines_cleared(self, event):
+        if event.count == 4:
+            self.add_currency("tetrises")
+        if event.all_clear:
+            self.add_currency("all_clears")
+
+    def on_spin_detected(self, event):
+        if not event.lines:
+            return
+        if event.piece_type == 'T':
+            if event.spin == SPIN:
+                self.add_currency(TSPIN_CURRENCY.get(event.lines))
+        else:
+            self.add_currency(SPIN_CURRENCY.get(event.piece_type))
+
+    def copy(self, events=None):
+        copied_wallet = wallet(events)
+        copied_wallet.wallet.update(self.wallet)
+        return copied_wallet
 
     def add_currency(self, event):
         if event in self.wallet:
@@ -21,4 +53,4 @@ class wallet:
 
     def reset(self):
         for key in self.wallet:
-            self.wallet[key] = 0
\ No newline at end of file
+            self.wallet[key] = 0
@@ -64,9 +64,32 @@ WALL_KICKS = {
     'O': {}
 }
 
+# Half turns, with offsets written the same way as WALL_KICKS above
+WALL_KICKS_180 = {
+    'I': {
+        (0, 2): [(0, 0), (0, 1)],
+        (1, 3): [(0, 0), (1, 0)],
+        (2, 0): [(0, 0), (0, -1)],
+        (3, 1): [(0, 0), (-1, 0)]
+    },
+    'O': {}
+}
+for _piece_type in ('J', 'L', 'S', 'T', 'Z'):
+    WALL_KICKS_180[_piece_type] = {
+        (0, 2): [(0, 0), (0, 1), (1, 1), (-1, 1), (1, 0), (-1, 0)],
+        (1, 3): [(0, 0), (1, 0), (1, 2), (1, 1), (0, 2), (0, 1)],
+        (2, 0): [(0, 0), (0, -1), (-1, -1), (1, -1), (-1, 0), (1, 0)],
+        (3, 1): [(0, 0), (-1, 0), (-1, 2), (-1, 1), (0, 2), (0, 1)]
+    }
+
+_NO_KICKS = [(0, 0)]
+
+
 def get_wall_kicks(piece_type, from_state, to_state):
-    if piece_type == 'O':
-        return [(0, 0)]  # O pieces don't have wall kicks
-    if piece_type in ['I', 'J','L','S','T','Z']:
-        return WALL_KICKS[piece_type].get((from_state, to_state), [(0, 0)])
-    return [(0, 0)]
+    # Kick offsets to try in order for a quarter or half turn; O pieces and
+    # unknown turns only try staying in place. See rotation.py for the
+    # compiled tables the game uses.
+    key = (from_state, to_state)
+    return (WALL_KICKS.get(piece_type, {}).get(key)
+            or WALL_KICKS_180.get(piece_type, {}).get(key)
+            or _NO_KICKS)
@@ -0,0 +1,60 @@
+import random
+
+from config import Config
+from pieces import PIECE_TYPES
+
+# Fixed random 64-bit keys. The seed is constant so hashes are the same in
+# every process and every run.
+#   KEYS[y][bit]: a grid cell, by BitBoard row bit (column x is bit x + PAD)
+#   TYPE/ROTATION/X/Y_KEYS: the parts of the current piece's pose
+#   HOLD_KEYS[type], BAG_KEYS[position][type]: the held piece and bag
+ROW_BITS = 64
+POSE_RANGE = 64  # Piece x and y are offset by half of this, covering the hidden rows and kicks
+_rng = random.Random(0x5eed)
+
+
+def _keys(count):
+    return [_rng.getrandbits(64) for _ in range(count)]
+
+
+KEYS = [_keys(ROW_BITS) for _ in range(Config.BOARD_HEIGHT)]
+TYPE_KEYS = dict(zip(PIECE_TYPES, _keys(7)))
+ROTATION_KEYS = _keys(4)
+X_KEYS = _keys(POSE_RANGE)
+Y_KEYS = _keys(POSE_RANGE)
+HOLD_KEYS = dict(zip(PIECE_TYPES, _keys(7)))
+BAG_KEYS = [dict(zip(PIECE_TYPES, _keys(7))) for _ in range(32)]
+
+
+def bag_keys(count):
+    # BAG_KEYS, first grown to count positions if a long preview rule needs
+    # more. Keys only come from _rng here after import, so they are still
+    # the same in every process.
+    while len(BAG_KEYS) < count:
+        BAG_KEYS.append(dict(zip(PIECE_TYPES, _keys(7))))
+    return BAG_KEYS
+
+
+def hash_bits(y, bits):
+    # XOR of the keys for the cells set in one BitBoard row mask
+    keys = KEYS[y]
+    value = 0
+    while bits:
+        low = bits & -bits
+        value ^= keys[low.bit_length() - 1]
+        bits ^= low
+    return value
+
+
+def hash_rows(rows):
+    value = 0
+    for y, bits in enumerate(rows):
+        if bits:
+            value ^= hash_bits(y, bits)
+    return value
+
+
+def piece_key(piece):
+    offset = POSE_RANGE // 2
+    return (TYPE_KEYS[piece.type] ^ ROTATION_KEYS[piece.current_state]
+            ^ X_KEYS[piece.x + offset] ^ Y_KEYS[piece.y + offset])